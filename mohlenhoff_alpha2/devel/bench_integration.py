@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of the monitor loop against the mock servers.
+
+Starts mock_server.py and mock_ha_server.py, then runs Alpha2Integration
+cycles for configurations with a growing number of areas and prints per-cycle
+latency percentiles, requests, body bytes and CPU time as JSON. The Alpha 2
+mock gets a state from generate_fixture.py with a HEATAREA and a virtual
+device for every configured area.
+
+CPU time is the one of the integration process only, the mock servers run in
+their own processes.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import requests
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(script, port, *args):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(DEVEL_DIR, script), '--host', '127.0.0.1', '--port', str(port), *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    # Wait until the server accepts connections
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.05)
+
+    process.kill()
+    raise RuntimeError(f"{script} did not start on port {port}")
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Counters:
+    def __init__(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def response_hook(self, response, *args, **kwargs):
+        """requests hook counting HTTP body bytes in both directions"""
+        self.requests += 1
+        body = response.request.body
+        self.bytes_sent += len(body) if body else 0
+        self.bytes_received += int(response.headers.get('Content-Length', 0))
+
+    def trace_config(self):
+        """aiohttp tracing counting HTTP body bytes in both directions"""
+        import aiohttp
+
+        async def on_request_end(session, context, params):
+            self.requests += 1
+
+        async def on_request_chunk_sent(session, context, params):
+            self.bytes_sent += len(params.chunk)
+
+        async def on_response_chunk_received(session, context, params):
+            self.bytes_received += len(params.chunk)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        return trace_config
+
+
+def change_sensors(ha_url, entity_ids, ratio, rng):
+    """Give a share of the sensors a new value so the deadband doesn't skip them"""
+    with requests.Session() as session:
+        for entity_id in rng.sample(entity_ids, round(len(entity_ids) * ratio)):
+            session.post(
+                f"{ha_url}/api/states/{entity_id}",
+                json={"state": f"{rng.uniform(18, 24):.1f}"},
+            )
+
+
+def workers_idle(integration):
+    return all(worker.idle for worker in integration.workers.values())
+
+
+def run_sync(integration, args, counters, change):
+    for worker in integration.workers.values():
+        worker.start()
+        worker.ready.wait()
+    integration.session.hooks['response'].append(counters.response_hook)
+
+    samples = []
+    for _ in range(args.cycles):
+        change()
+        requests_before = counters.requests
+        cpu = time.process_time()
+        started = time.perf_counter()
+        integration.run_cycle()
+        # A cycle only ends once the workers have sent its temperatures
+        while not workers_idle(integration):
+            time.sleep(0.0005)
+        samples.append((time.perf_counter() - started, time.process_time() - cpu, counters.requests - requests_before))
+    return samples
+
+
+async def run_async(integration, args, counters, change):
+    import alpha2_async_engine
+    from alpha2_async_client import create_async_session
+
+    semaphore = asyncio.Semaphore(integration.config['max_parallel_requests'])
+    samples = []
+    async with create_async_session(trace_configs=[counters.trace_config()]) as session:
+        tasks = [asyncio.create_task(alpha2_async_engine.run_worker(worker, session, semaphore)) for worker in integration.workers.values()]
+        for worker in integration.workers.values():
+            await asyncio.to_thread(worker.ready.wait)
+
+        for _ in range(args.cycles):
+            change()
+            requests_before = counters.requests
+            cpu = time.process_time()
+            started = time.perf_counter()
+            await alpha2_async_engine.run_cycle(integration, session)
+            while not workers_idle(integration):
+                await asyncio.sleep(0.0005)
+            samples.append((time.perf_counter() - started, time.process_time() - cpu, counters.requests - requests_before))
+
+        for task in tasks:
+            task.cancel()
+    return samples
+
+
+def write_fixture(directory, areas, seed):
+    """Write a mock state with a HEATCTRL, a room controller and a virtual device per area"""
+    from generate_fixture import generate_state
+
+    path = os.path.join(directory, 'alpha2_data.json')
+    with open(path, 'w') as f:
+        json.dump(generate_state(areas, areas, 2 * areas, seed), f)
+    return path
+
+
+def bench_size(areas, args, rng):
+    from alpha2_integration import Alpha2Integration
+
+    alpha2_port = free_port()
+    ha_port = free_port()
+    ha_url = f"http://127.0.0.1:{ha_port}"
+    entity_ids = [f"sensor.bench_{area}" for area in range(1, areas + 1)]
+
+    # Injected faults use the seed as well, so runs with faults are reproducible
+    faults = ['--faults', args.mock_faults, '--fault-seed', str(args.seed)] if args.mock_faults else []
+    # --in-memory never reads a data file, the copy in the temporary directory
+    # is loaded instead and effectively never written back
+    directory = tempfile.TemporaryDirectory()
+    data_file = write_fixture(directory.name, areas, args.seed)
+    servers = [
+        start_server('mock_server.py', alpha2_port, '--data-file', data_file, '--flush-interval', '86400',
+                     '--no-flush-on-exit', '--server', args.mock_server, *faults),
+        start_server('mock_ha_server.py', ha_port),
+    ]
+    try:
+        change_sensors(ha_url, entity_ids, 1.0, rng)
+
+        os.environ.update({
+            'ALPHA2_HOST': f"127.0.0.1:{alpha2_port}",
+            'SUPERVISOR_URL': ha_url,
+            'UPDATE_INTERVAL': '60',
+            'ENGINE': args.engine,
+            'DEADBAND': str(args.deadband),
+            'VIRTUAL_DEVICES': json.dumps([
+                {"name": f"Bench {area}", "area_id": area, "temperature_entity_id": entity_id}
+                for area, entity_id in zip(range(1, areas + 1), entity_ids)
+            ]),
+        })
+        integration = Alpha2Integration()
+
+        counters = Counters()
+        change = lambda: change_sensors(ha_url, entity_ids, args.change_ratio, rng)
+        if args.engine == 'async':
+            samples = asyncio.run(run_async(integration, args, counters, change))
+        else:
+            samples = run_sync(integration, args, counters, change)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        directory.cleanup()
+
+    latencies = [latency * 1000 for latency, _, _ in samples]
+    return {
+        "areas": areas,
+        "cycles": len(samples),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+            "mean": sum(latencies) / len(latencies),
+        },
+        "requests_per_cycle": sum(count for _, _, count in samples) / len(samples),
+        "bytes_sent_per_cycle": counters.bytes_sent / len(samples),
+        "bytes_received_per_cycle": counters.bytes_received / len(samples),
+        "cpu_ms_per_cycle": sum(cpu for _, cpu, _ in samples) * 1000 / len(samples),
+    }
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark Alpha2Integration against the mock servers')
+    parser.add_argument('--areas', type=int, nargs='+', default=[1, 10, 50, 100, 200],
+                        help='Numbers of configured areas to benchmark (default: 1 10 50 100 200)')
+    parser.add_argument('--cycles', type=int, default=50,
+                        help='Monitor loop cycles per configuration (default: 50)')
+    parser.add_argument('--engine', choices=['sync', 'async'], default='sync',
+                        help='Engine of the integration (default: sync)')
+    parser.add_argument('--mock-server', choices=['flask', 'waitress'], default='waitress',
+                        help='Server the Alpha 2 mock runs on (default: waitress)')
+    parser.add_argument('--mock-faults', type=str,
+                        help='Faults injected by the Alpha 2 mock as JSON, e.g. \'{"all": {"latency": "lognormal:50:0.5"}}\'')
+    parser.add_argument('--change-ratio', type=float, default=1.0,
+                        help='Share of sensors changing before every cycle (default: 1.0)')
+    parser.add_argument('--deadband', type=float, default=0.0,
+                        help='Deadband of the integration (default: 0.0)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the generated sensor values (default: 0)')
+    parser.add_argument('--output', type=str,
+                        help='Write the JSON results to this file instead of stdout')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    # Keep the integration's per-cycle logging out of the measurements
+    logging.disable(logging.WARNING)
+
+    results = {
+        "benchmark": "integration",
+        "engine": args.engine,
+        "mock_server": args.mock_server,
+        "mock_faults": json.loads(args.mock_faults) if args.mock_faults else None,
+        "change_ratio": args.change_ratio,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": [bench_size(areas, args, rng) for areas in args.areas],
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
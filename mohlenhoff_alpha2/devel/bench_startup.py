@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Startup time and memory benchmark of the integration per transport.
+
+Starts mock_server.py and mock_ha_server.py, then launches a fresh
+interpreter per run that imports alpha2_integration, creates the virtual
+devices and completes the first monitor loop cycle. Prints the median
+times and the peak resident memory per transport as JSON.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import time
+
+from bench_integration import free_port, start_server, change_sensors
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+BIN_DIR = os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin')
+
+# Runs in the measured interpreter and prints its measurements as JSON
+CHILD = """
+import sys, time, json, logging
+started = time.perf_counter()
+logging.disable(logging.WARNING)
+from alpha2_integration import Alpha2Integration
+imported = time.perf_counter()
+
+integration = Alpha2Integration()
+for worker in integration.workers.values():
+    worker.start()
+    worker.ready.wait()
+integration.run_cycle()
+while not all(worker.idle for worker in integration.workers.values()):
+    time.sleep(0.0005)
+finished = time.perf_counter()
+
+with open('/proc/self/status') as f:
+    status = dict(line.split(':', 1) for line in f)
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_cycle_ms": (finished - imported) * 1000,
+    "rss_kb": int(status['VmHWM'].split()[0]),
+    "modules": len(sys.modules),
+    "requests_loaded": 'requests' in sys.modules,
+}))
+"""
+
+
+def run_child(env):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], env=env, cwd=BIN_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output)
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def bench_transport(transport, args, env):
+    env = dict(env, TRANSPORT=transport)
+    runs = [run_child(env) for _ in range(args.runs)]
+
+    return {
+        "transport": transport,
+        "runs": len(runs),
+        "process_ms": statistics.median(run['process_ms'] for run in runs),
+        "import_ms": statistics.median(run['import_ms'] for run in runs),
+        "first_cycle_ms": statistics.median(run['first_cycle_ms'] for run in runs),
+        "peak_rss_kb": max(run['rss_kb'] for run in runs),
+        "modules": runs[0]['modules'],
+        "requests_loaded": runs[0]['requests_loaded'],
+    }
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark startup time and memory of the integration')
+    parser.add_argument('--transports', nargs='+', choices=['requests', 'stdlib'], default=['requests', 'stdlib'],
+                        help='Transports to benchmark (default: requests stdlib)')
+    parser.add_argument('--runs', type=int, default=10,
+                        help='Interpreter launches per transport (default: 10)')
+    parser.add_argument('--areas', type=int, default=10,
+                        help='Number of configured areas (default: 10)')
+    parser.add_argument('--output', type=str,
+                        help='Write the JSON results to this file instead of stdout')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    alpha2_port = free_port()
+    ha_port = free_port()
+    ha_url = f"http://127.0.0.1:{ha_port}"
+    entity_ids = [f"sensor.bench_{area}" for area in range(1, args.areas + 1)]
+
+    servers = [
+        start_server('mock_server.py', alpha2_port, '--in-memory', '--server', 'waitress'),
+        start_server('mock_ha_server.py', ha_port),
+    ]
+    try:
+        change_sensors(ha_url, entity_ids, 1.0, random.Random(0))
+        env = dict(
+            os.environ,
+            ALPHA2_HOST=f"127.0.0.1:{alpha2_port}",
+            SUPERVISOR_URL=ha_url,
+            VIRTUAL_DEVICES=json.dumps([
+                {"name": f"Bench {area}", "area_id": area, "temperature_entity_id": entity_id}
+                for area, entity_id in zip(range(1, args.areas + 1), entity_ids)
+            ]),
+        )
+        results = {
+            "benchmark": "startup",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": [bench_transport(transport, args, env) for transport in args.transports],
+        }
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Microbenchmarks of the XML build and parse paths of the add-on and the mock.
+
+Generates controller states of growing size with generate_fixture.py and
+times the client side (building changes.xml, parsing static.xml and
+cyclic.xml) and the mock side (rendering the views, parsing and applying
+commands) on them. Prints the median and minimum time per call as JSON.
+
+With --baseline the results of an earlier run are compared case by case,
+so the effect of a parser or renderer change shows up as a ratio.
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+import platform
+import statistics
+import xml.etree.ElementTree as ET
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+import mock_server
+from generate_fixture import PRESETS, generate_state
+from alpha2_client import build_update_xml, iter_device_children, CHUNK_SIZE
+from alpha2_model import Alpha2Model
+
+
+def iter_events(document):
+    """Feed a document to an XMLPullParser in network sized chunks like Alpha2Client does"""
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    for start in range(0, len(document), CHUNK_SIZE):
+        parser.feed(document[start:start + CHUNK_SIZE])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def iter_children(document):
+    return iter_device_children(iter_events(document))
+
+
+def apply_static(document):
+    model = Alpha2Model()
+    model.apply(iter_children(document), complete=True)
+
+
+def render(data, view, pretty=True):
+    return mock_server.generate_xml(data, view, pretty).encode('utf-8')
+
+
+def add_all_elements(data):
+    device = ET.SubElement(ET.Element("Devices"), "Device")
+    mock_server.add_elements(device, data["Device"])
+
+
+def cases(data):
+    """The benchmarked functions on a state, as (side, name, function)"""
+    device = data["Device"]
+    static = render(data, "static")
+    cyclic = render(data, "cyclic")
+    temperatures = {area["nr"]: area["T_ACTUAL"] for area in device["HEATAREAS"]}
+    command = build_update_xml(device["ID"], temperatures)
+    blocks = mock_server.parse_command_xml(command)
+    index = mock_server.StateIndex(data)
+
+    model = Alpha2Model()
+    model.apply(iter_children(static), complete=True)
+
+    return [
+        ("client", "build_update_xml", lambda: build_update_xml(device["ID"], temperatures)),
+        ("client", "ET.fromstring static", lambda: ET.fromstring(static)),
+        ("client", "ET.fromstring cyclic", lambda: ET.fromstring(cyclic)),
+        # Documents above STREAM_THRESHOLD are parsed like this while they arrive
+        ("client", "iter_device_children static", lambda: sum(1 for _ in iter_children(static))),
+        ("client", "Alpha2Model.apply static", lambda: apply_static(static)),
+        # The state doesn't change between calls, so this is the cost of finding no delta
+        ("client", "Alpha2Model.apply cyclic", lambda: model.apply(iter_children(cyclic))),
+        ("mock", "generate_xml static", lambda: render(data, "static")),
+        ("mock", "generate_xml static compact", lambda: render(data, "static", pretty=False)),
+        ("mock", "generate_xml dynamic", lambda: render(data, "dynamic")),
+        ("mock", "generate_xml cyclic", lambda: render(data, "cyclic")),
+        ("mock", "add_elements static", lambda: add_all_elements(data)),
+        ("mock", "parse_command_xml update", lambda: mock_server.parse_command_xml(command)),
+        # Setting the same temperatures again leaves the state as it was
+        ("mock", "apply_command update", lambda: mock_server.apply_command(data, blocks, index)),
+    ]
+
+
+def measure(function, repeat):
+    """Time function like python -m timeit: calibrate the calls per run, then take repeat runs"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = [elapsed / number for elapsed in timer.repeat(repeat, number)]
+    return {
+        "calls": number,
+        "median_us": statistics.median(times) * 1e6,
+        "min_us": min(times) * 1e6,
+    }
+
+
+def bench_size(size, args, baseline):
+    areas, heat_ctrls, iodevices = PRESETS[size]
+    data = generate_state(areas, heat_ctrls, iodevices, args.seed)
+
+    results = []
+    for side, name, function in cases(data):
+        if args.filter and args.filter not in name:
+            continue
+
+        result = {"side": side, "name": name, **measure(function, args.repeat)}
+        previous = baseline.get((size, name))
+        if previous:
+            result["baseline_median_us"] = previous
+            result["change"] = result["median_us"] / previous
+        results.append(result)
+
+    return {
+        "size": size,
+        "heat_areas": areas,
+        "heat_ctrls": heat_ctrls,
+        "iodevices": iodevices,
+        "static_bytes": len(render(data, "static")),
+        "cyclic_bytes": len(render(data, "cyclic")),
+        "cases": results,
+    }
+
+
+def load_baseline(path):
+    """Median per (size, case) of an earlier run"""
+    if not path:
+        return {}
+
+    with open(path) as f:
+        previous = json.load(f)
+    return {
+        (result["size"], case["name"]): case["median_us"]
+        for result in previous["results"]
+        for case in result["cases"]
+    }
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the XML build and parse paths')
+    parser.add_argument('--sizes', nargs='+', choices=sorted(PRESETS), default=['default', 'large', 'stress'],
+                        help='Generated states to benchmark (default: default large stress)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timed runs per case, each calibrated to at least 0.2 seconds (default: 5)')
+    parser.add_argument('--filter', type=str,
+                        help='Only run the cases whose name contains this text')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the generated states (default: 0)')
+    parser.add_argument('--baseline', type=str,
+                        help='JSON results of an earlier run to compare with')
+    parser.add_argument('--output', type=str,
+                        help='Write the JSON results to this file instead of stdout')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    baseline = load_baseline(args.baseline)
+
+    results = {
+        "benchmark": "xml",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": [bench_size(size, args, baseline) for size in args.sizes],
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
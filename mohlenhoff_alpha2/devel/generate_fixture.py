@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Generate large controller states for mock_server.py and the benchmarks.
+
+The mock's default state has 2 HEATAREAs, 2 HEATCTRLs and 2 IODEVICEs.
+This writes a state in the same format with any number of them, based on
+the default state, so it can be loaded with mock_server.py --data-file.
+"""
+import copy
+import json
+import random
+import argparse
+
+import mock_server
+
+# Sizes by name as (HEATAREAs, HEATCTRLs, IODEVICEs)
+PRESETS = {
+    "default": (2, 2, 2),
+    # A fully equipped base station with a room controller and a virtual room per area
+    "large": (12, 12, 24),
+    # area_id of a virtual device goes up to 255 in the add-on configuration
+    "stress": (255, 255, 510),
+}
+
+
+def default_state():
+    """The default state of the mock, without reading or writing its data file"""
+    in_memory = mock_server.IN_MEMORY
+    mock_server.IN_MEMORY = True
+    try:
+        return mock_server.init_data()
+    finally:
+        mock_server.IN_MEMORY = in_memory
+
+
+def generate_state(areas, heat_ctrls, iodevices, seed=0):
+    """Generate a state of the mock with the given number of elements"""
+    rng = random.Random(seed)
+    state = default_state()
+    device = state["Device"]
+    area_template = device["HEATAREAS"][0]
+    ctrl_template = device["HEATCTRLS"][0]
+    iodevice_template = device["IODEVICES"][0]
+
+    device["HEATAREAS"] = []
+    for nr in range(1, areas + 1):
+        area = copy.deepcopy(area_template)
+        temperature = round(rng.uniform(17, 24), 1)
+        area.update({
+            "nr": nr,
+            "HEATAREA_NAME": f"Room {nr}",
+            "T_ACTUAL": temperature,
+            "T_ACTUAL_EXT": temperature,
+            "T_TARGET": round(rng.uniform(18, 23) * 2) / 2,
+            "HEATAREA_STATE": rng.randint(0, 1),
+            "LOCK_CODE": f"{rng.getrandbits(64):016X}",
+        })
+        device["HEATAREAS"].append(area)
+
+    device["HEATCTRLS"] = []
+    for nr in range(1, heat_ctrls + 1):
+        actor = rng.randint(0, 1)
+        ctrl = dict(ctrl_template, nr=nr, HEATAREA_NR=(nr - 1) % areas + 1, ACTOR=actor,
+                    ACTOR_PERCENT=rng.randint(10, 100) if actor else 0, HEATCTRL_STATE=actor)
+        device["HEATCTRLS"].append(ctrl)
+
+    # Room controllers first, then virtual rooms like the ones created by the add-on
+    device["IODEVICES"] = []
+    for nr in range(1, iodevices + 1):
+        virtual = nr > iodevices // 2
+        iodevice = dict(iodevice_template, nr=nr, IODEVICE_ID=nr, HEATAREA_NR=(nr - 1) % areas + 1,
+                        SIGNALSTRENGTH=rng.randint(1, 3), BATTERY=rng.randint(0, 2))
+        if virtual:
+            iodevice.update(IODEVICE_TYPE=8, IODEVICE_VERS_HW=0, IODEVICE_VERS_SW="00.00")
+        device["IODEVICES"].append(iodevice)
+
+    return state
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description='Generate a large controller state for the Alpha 2 mock')
+    parser.add_argument('--size', choices=sorted(PRESETS), default='large',
+                        help='Preset of the number of HEATAREAs, HEATCTRLs and IODEVICEs (default: large)')
+    parser.add_argument('--areas', type=int, help='Number of HEATAREAs, overrides the preset')
+    parser.add_argument('--heat-ctrls', type=int, help='Number of HEATCTRLs, overrides the preset')
+    parser.add_argument('--iodevices', type=int, help='Number of IODEVICEs, overrides the preset')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the generated values (default: 0)')
+    parser.add_argument('--output', type=str, default='alpha2_data.json',
+                        help='File to write the state to (default: alpha2_data.json)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    areas, heat_ctrls, iodevices = PRESETS[args.size]
+    state = generate_state(
+        args.areas or areas, args.heat_ctrls or heat_ctrls, args.iodevices or iodevices, args.seed
+    )
+
+    with open(args.output, 'w') as f:
+        json.dump(state, f, indent=2)
+    print(f"Wrote {len(state['Device']['HEATAREAS'])} HEATAREAs, {len(state['Device']['HEATCTRLS'])} HEATCTRLs "
+          f"and {len(state['Device']['IODEVICES'])} IODEVICEs to {args.output}")
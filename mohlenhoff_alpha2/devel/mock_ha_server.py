@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from flask import Flask, request, jsonify, abort
+from flask_sock import Sock
+
+app = Flask(__name__)
+sock = Sock(app)
+
+# Entity states keyed by entity_id
+states = {}
+
+# Open WebSocket connections with subscribe_entities, as (subscription id, entity IDs or None for all)
+subscribers = {}
+subscribers_lock = threading.Lock()
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def compress_state(state):
+    """A state object in the compressed format of subscribe_entities"""
+    return {"s": state["state"], "a": state["attributes"], "c": "", "lc": time.time()}
+
+
+def diff_states(old_state, new_state):
+    """The changed parts of a state in the format of subscribe_entities"""
+    attributes = {
+        key: value for key, value in new_state["attributes"].items()
+        if old_state["attributes"].get(key) != value
+    }
+    diff = {"+": {"lu": time.time(), "c": ""}}
+    if new_state["state"] != old_state["state"]:
+        diff["+"].update(s=new_state["state"], lc=time.time())
+    if attributes:
+        diff["+"]["a"] = attributes
+    removed = [key for key in old_state["attributes"] if key not in new_state["attributes"]]
+    if removed:
+        diff["-"] = {"a": removed}
+    return diff
+
+
+def set_state(entity_id, state, attributes=None):
+    old_state = states.get(entity_id)
+    new_state = {
+        "entity_id": entity_id,
+        "state": str(state),
+        "attributes": attributes or {},
+        "last_changed": now(),
+        "last_updated": now(),
+    }
+    states[entity_id] = new_state
+
+    # Notify the subscribers of the entity like Home Assistant does
+    if old_state is None:
+        event = {"a": {entity_id: compress_state(new_state)}}
+    else:
+        event = {"c": {entity_id: diff_states(old_state, new_state)}}
+    with subscribers_lock:
+        for ws, (subscription_id, entity_ids) in list(subscribers.items()):
+            if entity_ids is not None and entity_id not in entity_ids:
+                continue
+            try:
+                ws.send(json.dumps({"id": subscription_id, "type": "event", "event": event}))
+            except Exception as e:
+                app.logger.warning(f"Dropping WebSocket subscriber: {e}")
+                del subscribers[ws]
+
+    return new_state
+
+
+# Flask routes
+@app.route('/api/', methods=['GET'])
+def get_api():
+    return jsonify({"message": "API running."})
+
+
+@app.route('/api/states', methods=['GET'])
+def get_states():
+    return jsonify(list(states.values()))
+
+
+@app.route('/api/states/<entity_id>', methods=['GET'])
+def get_state(entity_id):
+    if entity_id not in states:
+        abort(404, description="Entity not found.")
+    return jsonify(states[entity_id])
+
+
+@app.route('/api/states/<entity_id>', methods=['POST'])
+def post_state(entity_id):
+    body = request.get_json(silent=True)
+    if not body or "state" not in body:
+        abort(400, description="No state specified.")
+
+    status = 200 if entity_id in states else 201
+    return jsonify(set_state(entity_id, body["state"], body.get("attributes"))), status
+
+
+# Served under the path the Supervisor proxy uses for Home Assistant Core
+@sock.route('/websocket')
+def websocket_api(ws):
+    ws.send(json.dumps({"type": "auth_required", "ha_version": "mock"}))
+
+    message = json.loads(ws.receive())
+    if message.get("type") != "auth":
+        ws.send(json.dumps({"type": "auth_invalid", "message": "Expected auth message"}))
+        return
+    ws.send(json.dumps({"type": "auth_ok", "ha_version": "mock"}))
+
+    try:
+        while True:
+            message = json.loads(ws.receive())
+            msg_id = message.get("id")
+
+            if message.get("type") == "subscribe_entities":
+                entity_ids = set(message["entity_ids"]) if "entity_ids" in message else None
+                with subscribers_lock:
+                    subscribers[ws] = (msg_id, entity_ids)
+                    ws.send(json.dumps({"id": msg_id, "type": "result", "success": True, "result": None}))
+                    # The subscription starts with the current states
+                    current = {
+                        entity_id: compress_state(state) for entity_id, state in states.items()
+                        if entity_ids is None or entity_id in entity_ids
+                    }
+                    ws.send(json.dumps({"id": msg_id, "type": "event", "event": {"a": current}}))
+            elif message.get("type") == "ping":
+                ws.send(json.dumps({"id": msg_id, "type": "pong"}))
+            else:
+                ws.send(json.dumps({
+                    "id": msg_id,
+                    "type": "result",
+                    "success": False,
+                    "error": {"code": "unknown_command", "message": "Unknown command."},
+                }))
+    finally:
+        with subscribers_lock:
+            subscribers.pop(ws, None)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    # Default values
+    default_host = "0.0.0.0"
+    default_port = 8123
+
+    # Check for environment variables
+    env_host = os.environ.get("HA_HOST", default_host)
+    env_port = int(os.environ.get("HA_PORT", default_port))
+
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Home Assistant REST and WebSocket API Mock Server')
+    parser.add_argument('--host', type=str, default=env_host,
+                        help=f'Host to bind the server to (default: {env_host})')
+    parser.add_argument('--port', type=int, default=env_port,
+                        help=f'Port to bind the server to (default: {env_port})')
+    parser.add_argument('--entity', action='append', default=[], metavar='ENTITY_ID=STATE',
+                        help='Initial entity state, may be given several times')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # Parse configuration
+    args = parse_args()
+
+    for entity in args.entity:
+        entity_id, state = entity.split('=', 1)
+        set_state(entity_id, state, {"unit_of_measurement": "°C", "device_class": "temperature"})
+
+    # Print configuration
+    print(f"Starting Home Assistant Mock Server:")
+    print(f"  Host: {args.host}")
+    print(f"  Port: {args.port}")
+    print(f"  Entities: {len(states)}")
+
+    # Run the server
+    app.run(host=args.host, port=args.port)
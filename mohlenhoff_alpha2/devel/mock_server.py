@@ -1,19 +1,81 @@
 import os
+import sys
 import json
+import time
+import random
+import atexit
+import functools
+import signal
+import threading
 import xml.etree.ElementTree as ET
 import xml.dom.minidom as minidom
 import argparse
 from datetime import datetime
-from flask import Flask, request, Response, abort
+from flask import Flask, request, Response, abort, jsonify
 
 app = Flask(__name__)
 
 # Path for persistent JSON storage
 DATA_FILE = "alpha2_data.json"
 
+# Keep the state only in memory and never touch DATA_FILE
+IN_MEMORY = False
+
+# Seconds between write-behind flushes of a changed state to DATA_FILE
+FLUSH_INTERVAL = 1.0
+
+# Pretty print the XML views like the real firmware does
+PRETTY_PRINT = True
+
+# Rendered XML views by type, cleared whenever a command changes the state.
+# DATETIME and DAYOFWEEK are rendered as markers and filled in per request.
+view_cache = {}
+DATETIME_MARK = b"@@DATETIME@@"
+DAYOFWEEK_MARK = b"@@DAYOFWEEK@@"
+
+# System state shared by all requests, loaded once by get_data() together
+# with its StateIndex. Every read or write of it happens under state_lock, so
+# concurrent requests never interleave a command with another command or a
+# rendered view.
+state = None
+state_index = None
+state_dirty = False
+state_lock = threading.RLock()
+
+# Endpoints faults can be injected into, "all" in a setting applies it to each of them
+FAULT_ENDPOINTS = ("static", "dynamic", "cyclic", "changes")
+
+# Fault settings of an endpoint. latency is a distribution in milliseconds,
+# see latency_sampler(), the rates are probabilities per request and hang
+# holds every request until it is switched off again, at most HANG_TIMEOUT.
+FAULT_DEFAULTS = {
+    "latency": None,
+    "error_rate": 0.0,
+    "error_status": 500,
+    "reset_rate": 0.0,
+    "truncate_rate": 0.0,
+    "hang": False,
+}
+
+faults = {endpoint: dict(FAULT_DEFAULTS) for endpoint in FAULT_ENDPOINTS}
+fault_samplers = {}
+faults_lock = threading.Lock()
+# Notified whenever the fault settings change, wakes the hanging requests
+faults_changed = threading.Condition(faults_lock)
+fault_random = random.Random()
+
+# Seconds a hanging endpoint holds a request before it breaks off the
+# connection. Every hanging request blocks a worker thread, so without a bound
+# they could take all threads of the waitress server, /admin/faults included.
+HANG_TIMEOUT = 60.0
+
+# Bounds the requests hanging at the same time on a server with a fixed number
+# of worker threads, so one thread is always left to switch hang off again
+hang_slots = None
+
 # Initialize with default data if no persistence file exists
 def init_data():
-    if os.path.exists(DATA_FILE):
+    if not IN_MEMORY and os.path.exists(DATA_FILE):
         with open(DATA_FILE, 'r') as f:
             return json.load(f)
     
@@ -216,15 +278,210 @@ def init_data():
     }
     
     # Save the default data to the file
-    save_data(default_data)
+    if not IN_MEMORY:
+        save_data(default_data)
     return default_data
 
 def save_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_data_file(json.dumps(data, indent=2))
+
+def write_data_file(content):
+    # Write to a temporary file first so a crash never leaves a truncated file
+    tmp_file = f"{DATA_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(content)
+    os.replace(tmp_file, DATA_FILE)
+
+def get_data():
+    global state, state_index
+    if state is None:
+        with state_lock:
+            if state is None:
+                data = init_data()
+                state_index = StateIndex(data)
+                state = data
+    return state
+
+def mark_dirty():
+    global state_dirty
+    state_dirty = True
+
+def flush_data():
+    global state_dirty
+    if IN_MEMORY or state is None:
+        return
+
+    # Serialize under the lock, but write the file without blocking requests
+    with state_lock:
+        if not state_dirty:
+            return
+        state_dirty = False
+        state_index.remove_deleted(state)
+        snapshot = json.dumps(state, indent=2)
+
+    write_data_file(snapshot)
+
+def flush_loop():
+    # Write-behind: collect all changes of an interval into one write
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush_data()
+        except Exception as e:
+            app.logger.error(f"Error writing {DATA_FILE}: {str(e)}")
+
+def latency_sampler(spec):
+    """Return a function sampling a delay in seconds from a latency spec in milliseconds
+
+    "200" is a fixed delay, "uniform:50:500" is uniform between both values,
+    "normal:200:50" has a mean and a standard deviation, "lognormal:200:0.5"
+    a median and the sigma of the underlying normal distribution (long tail),
+    and "exp:200" is exponential with the given mean.
+    """
+    kind, _, params = str(spec).partition(':')
+    try:
+        if not params:
+            delay = float(kind) / 1000
+            return lambda: delay
+        values = [float(value) for value in params.split(':')]
+        if kind == "uniform":
+            low, high = values
+            return lambda: fault_random.uniform(low, high) / 1000
+        if kind == "normal":
+            mean, stddev = values
+            return lambda: max(0.0, fault_random.gauss(mean, stddev)) / 1000
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda: median * fault_random.lognormvariate(0, sigma) / 1000
+        if kind == "exp":
+            mean, = values
+            return lambda: fault_random.expovariate(1 / mean) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency {spec!r}")
+
+def is_number(value):
+    # bool is a subclass of int, but true is no rate or status
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def check_fault(key, value):
+    """Return value if it is valid for the fault setting key, raises ValueError otherwise"""
+    if key not in FAULT_DEFAULTS:
+        raise ValueError(f"Unknown fault setting {key!r}")
+    if key == "latency":
+        if value is not None:
+            latency_sampler(value)
+    elif key == "hang":
+        if not isinstance(value, bool):
+            raise ValueError("hang must be true or false")
+    elif key == "error_status":
+        if not isinstance(value, int) or isinstance(value, bool) or not 100 <= value <= 599:
+            raise ValueError("error_status must be an HTTP status between 100 and 599")
+    elif not is_number(value) or not 0 <= value <= 1:
+        raise ValueError(f"{key} must be a number between 0 and 1")
+    else:
+        value = float(value)
+    return value
+
+def set_faults(settings):
+    """Merge {endpoint or "all": {setting: value}} into the fault settings"""
+    # Check and convert everything first so an invalid request changes nothing
+    updates = {}
+    for endpoint, values in settings.items():
+        endpoints = FAULT_ENDPOINTS if endpoint == "all" else (endpoint,)
+        if endpoint != "all" and endpoint not in FAULT_ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {endpoint!r}")
+        if not isinstance(values, dict):
+            raise ValueError(f"Settings of {endpoint!r} must be an object")
+        for key, value in values.items():
+            value = check_fault(key, value)
+            for name in endpoints:
+                updates.setdefault(name, {})[key] = value
+    samplers = {
+        endpoint: latency_sampler(values["latency"]) if values["latency"] is not None else None
+        for endpoint, values in updates.items() if "latency" in values
+    }
+
+    global faults
+    with faults_lock:
+        faults = {endpoint: {**faults[endpoint], **updates.get(endpoint, {})} for endpoint in FAULT_ENDPOINTS}
+        fault_samplers.update(samplers)
+
+        for endpoint in FAULT_ENDPOINTS:
+            rates = sum(faults[endpoint][key] for key in ("error_rate", "reset_rate", "truncate_rate"))
+            if rates > 1:
+                app.logger.warning(f"Fault rates of {endpoint} add up to {rates}, later faults are rarer than set")
+        faults_changed.notify_all()
+
+def reset_faults():
+    with faults_lock:
+        for endpoint in FAULT_ENDPOINTS:
+            faults[endpoint] = dict(FAULT_DEFAULTS)
+        fault_samplers.clear()
+        faults_changed.notify_all()
+
+def dropped_response():
+    # The headers promise more than is sent, so the client sees the connection
+    # break off mid-response on the flask as well as on the waitress server
+    response = Response(iter([b'<?xml version="1.0" encoding="UTF-8"?>\n<Devices>']), mimetype='application/xml')
+    response.headers['Content-Length'] = '65536'
+    return response
+
+def truncated_response(response):
+    # A complete HTTP response whose XML document ends somewhere in the middle
+    body = response.get_data()
+    response.set_data(body[:fault_random.randint(1, max(1, len(body) - 1))])
+    return response
+
+def with_faults(endpoint):
+    """Inject the faults configured for endpoint into a route"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with faults_lock:
+                config = dict(faults[endpoint])
+                sampler = fault_samplers.get(endpoint)
+
+            if sampler is not None:
+                time.sleep(sampler())
+
+            # A hanging endpoint answers once hang is switched off, or breaks
+            # off the connection after HANG_TIMEOUT
+            if config["hang"]:
+                if hang_slots is not None and not hang_slots.acquire(blocking=False):
+                    app.logger.info(f"Too many hanging requests, dropping the request to {endpoint}")
+                    return dropped_response()
+                try:
+                    with faults_changed:
+                        released = faults_changed.wait_for(lambda: not faults[endpoint]["hang"], HANG_TIMEOUT)
+                finally:
+                    if hang_slots is not None:
+                        hang_slots.release()
+                if not released:
+                    app.logger.info(f"Hang of {endpoint} timed out, dropping the request")
+                    return dropped_response()
+
+            # One roll per request, so the rates are the shares of the requests
+            roll = fault_random.random()
+            if roll < config["error_rate"]:
+                app.logger.info(f"Injecting HTTP {config['error_status']} into {endpoint}")
+                return Response("Injected error", status=config["error_status"])
+            roll -= config["error_rate"]
+            if roll < config["reset_rate"]:
+                app.logger.info(f"Injecting connection reset into {endpoint}")
+                return dropped_response()
+            roll -= config["reset_rate"]
+
+            response = view(*args, **kwargs)
+            if roll < config["truncate_rate"]:
+                app.logger.info(f"Injecting truncated XML into {endpoint}")
+                return truncated_response(response)
+            return response
+        return wrapper
+    return decorator
 
 # Helper function to generate XML from data
-def generate_xml(data, type_name):
+def generate_xml(data, type_name, pretty=True):
     root = ET.Element("Devices")
     device = ET.SubElement(root, "Device")
     
@@ -281,15 +538,37 @@ def generate_xml(data, type_name):
                            "PROGRAM_WEEK", "PROGRAM_WEEKEND", "PARTY", 
                            "PARTY_REMAININGTIME", "PRESENCE", "ISLOCKED"])
         
+        add_array_elements(device, data["Device"].get("HEATCTRLS", []), "HEATCTRL",
+                          ["INUSE", "HEATAREA_NR", "ACTOR", "ACTOR_PERCENT", "HEATCTRL_STATE"])
+        
         add_array_elements(device, data["Device"]["IODEVICES"], "IODEVICE", 
                           ["SIGNALSTRENGTH", "BATTERY", "IODEVICE_STATE", 
                            "IODEVICE_COMERROR", "ISON"])
     
     # Convert to string and pretty print
+    if not pretty:
+        return '<?xml version="1.0" encoding="UTF-8"?>' + ET.tostring(root, encoding='unicode')
     rough_string = ET.tostring(root, 'utf-8')
     reparsed = minidom.parseString(rough_string)
     return reparsed.toprettyxml(indent="  ")
 
+def render_view(type_name):
+    content = view_cache.get(type_name)
+    if content is None:
+        # Render under the lock so a concurrent command can't leave a stale view behind
+        with state_lock:
+            data = get_data()
+            state_index.remove_deleted(data)
+            device = dict(data["Device"], DATETIME=DATETIME_MARK.decode(), DAYOFWEEK=DAYOFWEEK_MARK.decode())
+            content = generate_xml({"Device": device}, type_name, PRETTY_PRINT).encode('utf-8')
+            view_cache[type_name] = content
+
+    # Only the clock changes between requests
+    now = datetime.now()
+    return (content
+            .replace(DATETIME_MARK, now.strftime('%Y-%m-%dT%H:%M:%S').encode())
+            .replace(DAYOFWEEK_MARK, str(now.weekday() + 1).encode()))
+
 def add_elements(parent, data_dict):
     for key, value in data_dict.items():
         if isinstance(value, dict):
@@ -316,205 +595,243 @@ def add_array_elements(parent, array_data, element_name, fields):
 
 # Parse incoming XML commands
 def parse_command_xml(xml_data):
+    """Parse a changes.xml document into one dict per Device block
+
+    Every block keeps all of its COMMANDs in order under 'COMMANDS' and its
+    HEATAREA updates by nr under 'HEATAREAS', so a batched document with
+    several Device blocks loses nothing. Values are left as text. Empty
+    Device blocks are left out.
+    """
     try:
         root = ET.fromstring(xml_data)
-        command_data = {}
-        
+        blocks = []
+
         for device in root.findall('Device'):
-            # Check for commands
-            command = device.find('COMMAND')
-            if command is not None:
-                command_data['COMMAND'] = command.text
-            
-            # Check for ID
-            device_id = device.find('ID')
-            if device_id is not None:
-                command_data['ID'] = device_id.text
-            
-            # Process HEATAREA commands
-            for heatarea in device.findall('HEATAREA'):
-                nr = heatarea.get('nr')
-                if nr:
-                    heatarea_data = {}
-                    for child in heatarea:
-                        heatarea_data[child.tag] = child.text
-                    command_data[f'HEATAREA_{nr}'] = heatarea_data
-            
-            # Process other direct commands
-            for direct_command in ['DATETIME', 'COOLING', 'VACATION']:
-                elem = device.find(direct_command)
-                if elem is not None:
-                    if direct_command == 'VACATION':
-                        vacation_data = {}
-                        for child in elem:
-                            vacation_data[child.tag] = child.text
-                        command_data['VACATION'] = vacation_data
-                    else:
-                        command_data[direct_command] = elem.text
-            
-            # Process RELAIS commands
-            relais = device.find('RELAIS')
-            if relais is not None:
-                relais_data = {}
-                for child in relais:
-                    relais_data[child.tag] = child.text
-                command_data['RELAIS'] = relais_data
-        
-        return command_data
+            block = {'COMMANDS': [], 'HEATAREAS': {}}
+            for child in device:
+                if child.tag == 'COMMAND':
+                    block['COMMANDS'].append(child.text)
+                elif child.tag == 'ID':
+                    block['ID'] = child.text
+                elif child.tag == 'HEATAREA':
+                    nr = child.get('nr')
+                    if nr:
+                        # Repeated HEATAREAs of the same nr are merged
+                        block['HEATAREAS'].setdefault(nr, {}).update((elem.tag, elem.text) for elem in child)
+                elif child.tag in ('DATETIME', 'COOLING'):
+                    block[child.tag] = child.text
+                elif child.tag in ('VACATION', 'RELAIS'):
+                    block[child.tag] = {elem.tag: elem.text for elem in child}
+            if block['COMMANDS'] or block['HEATAREAS'] or len(block) > 2:
+                blocks.append(block)
+
+        return blocks
     except Exception as e:
         app.logger.error(f"Error parsing XML command: {str(e)}")
         return None
 
+class StateIndex:
+    """Lookups into the state by HEATAREA nr and IODEVICE_ID
+
+    Built once per state and kept up to date by apply_command(), so commands
+    don't scan the HEATAREAS and IODEVICES lists. Deleted IODEVICES stay in
+    the list until remove_deleted().
+    """
+
+    def __init__(self, data):
+        device = data["Device"]
+        self.areas = {area["nr"]: area for area in device["HEATAREAS"]}
+        self.iodevices = {iodevice["IODEVICE_ID"]: iodevice for iodevice in device["IODEVICES"]}
+        self.next_id = max(self.iodevices, default=0) + 1
+        self.next_nr = max((iodevice["nr"] for iodevice in device["IODEVICES"]), default=0) + 1
+        self.deleted = set()
+
+    def remove_deleted(self, data):
+        """Rebuild the IODEVICES list once for all deletes since it was last read"""
+        if self.deleted:
+            data["Device"]["IODEVICES"] = [
+                iodevice for iodevice in data["Device"]["IODEVICES"]
+                if iodevice["IODEVICE_ID"] not in self.deleted
+            ]
+            self.deleted.clear()
+
+def convert_area_value(key, value):
+    # Convert to appropriate type
+    if key in ('T_TARGET', 'T_ACTUAL'):
+        return float(value)
+    if key in ('HEATAREA_MODE', 'ISLOCKED'):
+        return int(value)
+    return value
+
+def prepare_commands(data, blocks, index):
+    """Convert the parsed blocks into a list of operations
+
+    Raises ValueError for malformed values and TypeError for empty ones.
+    """
+    operations = []
+
+    for block in blocks:
+        for command in block['COMMANDS']:
+            name, _, params = (command or '').partition(':')
+            values = params.split(',')
+            if name == 'CMD_CREATE_XMLDEVICE':
+                operations.append(('create', int(values[0])))
+            elif name == 'CMD_CONNECT_XMLDEVICE':
+                operations.append(('connect', int(values[0]), [int(area) for area in values[1:]]))
+            elif name == 'CMD_DELETE_XMLDEVICE':
+                operations.append(('delete', int(values[0])))
+            else:
+                app.logger.warning(f"Ignoring unknown command {command}")
+
+        # Direct property updates only apply to this base station
+        if block.get('ID') != data["Device"]["ID"]:
+            continue
+
+        if 'DATETIME' in block:
+            operations.append(('set', 'DATETIME', block['DATETIME']))
+        if 'COOLING' in block:
+            operations.append(('set', 'COOLING', int(block['COOLING'])))
+        if 'VACATION' in block:
+            operations.append(('merge', 'VACATION', block['VACATION']))
+        if 'RELAIS' in block:
+            relais = {key: int(value) if value and value.isdigit() else value for key, value in block['RELAIS'].items()}
+            operations.append(('merge', 'RELAIS', relais))
+
+        for nr, values in block['HEATAREAS'].items():
+            area = index.areas.get(int(nr))
+            if area is None:
+                app.logger.warning(f"Ignoring update of unknown HEATAREA {nr}")
+                continue
+            operations.append(('area', area, {key: convert_area_value(key, value) for key, value in values.items()}))
+
+    return operations
+
 # Apply commands to update the system state
-def apply_command(data, command_data):
-    if 'COMMAND' in command_data:
-        # Handle special commands (CREATE_XMLDEVICE, CONNECT_XMLDEVICE, etc.)
-        command = command_data['COMMAND']
-        if command.startswith('CMD_CREATE_XMLDEVICE:'):
-            # Extract heat areas from command
-            heat_areas = command.split(':')[1].split(',')
-            
-            # Find next available IODEVICE_ID
-            max_id = 0
-            for device in data["Device"]["IODEVICES"]:
-                if device["IODEVICE_ID"] > max_id:
-                    max_id = device["IODEVICE_ID"]
-            
-            new_id = max_id + 1
-            
+def apply_command(data, blocks, index):
+    """Apply all Device blocks of a changes.xml document at once
+
+    Every value is converted before the state is touched, so a malformed
+    document raises (see prepare_commands()) and changes nothing. Deleted
+    devices are removed from the list by index.remove_deleted() before the
+    state is read.
+    """
+    operations = prepare_commands(data, blocks, index)
+
+    updated_areas = 0
+    for operation in operations:
+        kind = operation[0]
+        if kind == 'area':
+            operation[1].update(operation[2])
+            updated_areas += 1
+
+        elif kind == 'create':
             # Create virtual room
             new_device = {
-                "nr": len(data["Device"]["IODEVICES"]) + 1,
+                "nr": index.next_nr,
                 "IODEVICE_TYPE": 8,  # Virtual room type
-                "IODEVICE_ID": new_id,
+                "IODEVICE_ID": index.next_id,
                 "IODEVICE_VERS_HW": 0,
                 "IODEVICE_VERS_SW": "00.00",
-                "HEATAREA_NR": int(heat_areas[0]),
+                "HEATAREA_NR": operation[1],
                 "SIGNALSTRENGTH": 2,
                 "BATTERY": 0,
                 "IODEVICE_STATE": 0,
                 "IODEVICE_COMERROR": 0,
                 "ISON": 1
             }
-            
             data["Device"]["IODEVICES"].append(new_device)
-            app.logger.info(f"Created virtual room with ID {new_id}")
-        
-        elif command.startswith('CMD_CONNECT_XMLDEVICE:'):
+            index.iodevices[index.next_id] = new_device
+            index.next_id += 1
+            index.next_nr += 1
+            app.logger.info(f"Created virtual room with ID {new_device['IODEVICE_ID']}")
+
+        elif kind == 'connect':
             # Connect virtual room to heat areas
-            parts = command.split(':')[1].split(',')
-            device_id = int(parts[0])
-            heat_areas = [int(area) for area in parts[1:]]
-            
-            # Find the device
-            for device in data["Device"]["IODEVICES"]:
-                if device["IODEVICE_ID"] == device_id:
-                    device["HEATAREA_NR"] = heat_areas[0]  # Update primary heat area
-                    app.logger.info(f"Connected device {device_id} to heat areas {heat_areas}")
-                    break
-        
-        elif command.startswith('CMD_DELETE_XMLDEVICE:'):
-            # Delete virtual room
-            device_id = int(command.split(':')[1])
-            
-            # Remove the device
-            data["Device"]["IODEVICES"] = [
-                device for device in data["Device"]["IODEVICES"] 
-                if device["IODEVICE_ID"] != device_id
-            ]
-            app.logger.info(f"Deleted device {device_id}")
-    
-    # Handle direct property updates
-    if 'ID' in command_data:
-        device_id = command_data['ID']
-        if device_id == data["Device"]["ID"]:
-            # Process DATETIME update
-            if 'DATETIME' in command_data:
-                data["Device"]["DATETIME"] = command_data['DATETIME']
-                app.logger.info(f"Updated DATETIME to {command_data['DATETIME']}")
-            
-            # Process COOLING update
-            if 'COOLING' in command_data:
-                data["Device"]["COOLING"] = int(command_data['COOLING'])
-                app.logger.info(f"Updated COOLING to {command_data['COOLING']}")
-            
-            # Process VACATION update
-            if 'VACATION' in command_data:
-                for key, value in command_data['VACATION'].items():
-                    data["Device"]["VACATION"][key] = value
-                app.logger.info("Updated VACATION settings")
-            
-            # Process RELAIS update
-            if 'RELAIS' in command_data:
-                for key, value in command_data['RELAIS'].items():
-                    data["Device"]["RELAIS"][key] = int(value) if value.isdigit() else value
-                app.logger.info("Updated RELAIS settings")
-            
-            # Process HEATAREA updates
-            for key, value in command_data.items():
-                if key.startswith('HEATAREA_'):
-                    area_nr = int(key.split('_')[1])
-                    # Find the heat area
-                    for area in data["Device"]["HEATAREAS"]:
-                        if area["nr"] == area_nr:
-                            for subkey, subvalue in value.items():
-                                # Convert to appropriate type
-                                if subkey in ['T_TARGET', 'T_ACTUAL']:
-                                    area[subkey] = float(subvalue)
-                                elif subkey in ['HEATAREA_MODE', 'ISLOCKED']:
-                                    area[subkey] = int(subvalue)
-                                else:
-                                    area[subkey] = subvalue
-                            app.logger.info(f"Updated HEATAREA {area_nr}")
-                            break
-    
+            _, device_id, heat_areas = operation
+            device = index.iodevices.get(device_id)
+            if device is not None and heat_areas:
+                device["HEATAREA_NR"] = heat_areas[0]  # Update primary heat area
+                app.logger.info(f"Connected device {device_id} to heat areas {heat_areas}")
+
+        elif kind == 'delete':
+            if index.iodevices.pop(operation[1], None) is not None:
+                index.deleted.add(operation[1])
+                app.logger.info(f"Deleted device {operation[1]}")
+
+        elif kind == 'set':
+            _, key, value = operation
+            data["Device"][key] = value
+            app.logger.info(f"Updated {key} to {value}")
+
+        elif kind == 'merge':
+            _, key, values = operation
+            data["Device"][key].update(values)
+            app.logger.info(f"Updated {key} settings")
+
+    if updated_areas:
+        app.logger.info(f"Updated {updated_areas} HEATAREAs")
+
     return data
 
 # Flask routes
 @app.route('/data/static.xml', methods=['GET'])
+@with_faults("static")
 def get_static_xml():
-    data = init_data()
-    xml_content = generate_xml(data, "static")
-    return Response(xml_content, mimetype='application/xml')
+    return Response(render_view("static"), mimetype='application/xml')
 
 @app.route('/data/dynamic.xml', methods=['GET'])
+@with_faults("dynamic")
 def get_dynamic_xml():
-    data = init_data()
-    xml_content = generate_xml(data, "dynamic")
-    return Response(xml_content, mimetype='application/xml')
+    return Response(render_view("dynamic"), mimetype='application/xml')
 
 @app.route('/data/cyclic.xml', methods=['GET'])
+@with_faults("cyclic")
 def get_cyclic_xml():
-    data = init_data()
-    # Update date and time for cyclic updates
-    data["Device"]["DATETIME"] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-    data["Device"]["DAYOFWEEK"] = datetime.now().weekday() + 1
-    save_data(data)
-    
-    xml_content = generate_xml(data, "cyclic")
-    return Response(xml_content, mimetype='application/xml')
+    return Response(render_view("cyclic"), mimetype='application/xml')
 
 @app.route('/data/changes.xml', methods=['POST'])
+@with_faults("changes")
 def post_changes():
     if not request.data:
         app.logger.warning("No XML data provided")
         abort(400, description="No XML data provided")
     
     xml_data = request.data.decode('utf-8')
-    command_data = parse_command_xml(xml_data)
+    blocks = parse_command_xml(xml_data)
     
-    if not command_data:
+    if not blocks:
         app.logger.warning("Invalid XML command format")
         abort(400, description="Invalid XML command format")
     
-    data = init_data()
-    updated_data = apply_command(data, command_data)
-    save_data(updated_data)
+    data = get_data()
+    with state_lock:
+        # All blocks of the document are applied, or none of them
+        try:
+            apply_command(data, blocks, state_index)
+        except (ValueError, TypeError) as e:
+            app.logger.warning(f"Rejecting command: {str(e)}")
+            abort(400, description=f"Invalid value in command: {str(e)}")
+        view_cache.clear()
+        mark_dirty()
     
     # Return success response
     response_xml = '<?xml version="1.0" encoding="UTF-8"?><response><status>OK</status></response>'
     return Response(response_xml, mimetype='application/xml')
 
+@app.route('/admin/faults', methods=['GET', 'PUT', 'DELETE'])
+def admin_faults():
+    """Read (GET), change (PUT with {endpoint or "all": {setting: value}}) or clear (DELETE) the faults"""
+    if request.method == 'PUT':
+        try:
+            set_faults(request.get_json(force=True))
+        except (AttributeError, TypeError, ValueError) as e:
+            abort(400, description=str(e))
+    elif request.method == 'DELETE':
+        reset_faults()
+
+    with faults_lock:
+        return jsonify(faults)
+
 def parse_args():
     """Parse command line arguments."""
     # Default values
@@ -522,12 +839,23 @@ def parse_args():
     default_port = 5000
     default_debug = False
     default_data_file = "alpha2_data.json"
+    default_flush_interval = 1.0
+    default_server = "flask"
+    default_threads = 8
+    default_hang_timeout = 60.0
     
     # Check for environment variables
     env_host = os.environ.get("ALPHA2_HOST", default_host)
     env_port = int(os.environ.get("ALPHA2_PORT", default_port))
     env_debug = os.environ.get("ALPHA2_DEBUG", "").lower() in ("true", "1", "yes")
     env_data_file = os.environ.get("ALPHA2_DATA_FILE", default_data_file)
+    env_in_memory = os.environ.get("ALPHA2_IN_MEMORY", "").lower() in ("true", "1", "yes")
+    env_flush_interval = float(os.environ.get("ALPHA2_FLUSH_INTERVAL", default_flush_interval))
+    env_pretty = os.environ.get("ALPHA2_PRETTY", "true").lower() in ("true", "1", "yes")
+    env_server = os.environ.get("ALPHA2_SERVER", default_server)
+    env_threads = int(os.environ.get("ALPHA2_THREADS", default_threads))
+    env_faults = os.environ.get("ALPHA2_FAULTS")
+    env_hang_timeout = float(os.environ.get("ALPHA2_HANG_TIMEOUT", default_hang_timeout))
     
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Alpha 2 XML API Mock Server')
@@ -539,12 +867,68 @@ def parse_args():
                         help='Enable debug mode')
     parser.add_argument('--data-file', type=str, default=env_data_file,
                         help=f'Path to the data file (default: {env_data_file})')
+    parser.add_argument('--in-memory', action='store_true', default=env_in_memory,
+                        help='Keep the state in memory only, for benchmarks')
+    parser.add_argument('--flush-interval', type=float, default=env_flush_interval,
+                        help=f'Seconds between writes of a changed state to the data file (default: {env_flush_interval})')
+    parser.add_argument('--server', choices=['flask', 'waitress'], default=env_server,
+                        help=f'Server to run on, waitress is a multi-threaded production server (default: {env_server})')
+    parser.add_argument('--threads', type=int, default=env_threads,
+                        help=f'Worker threads of the waitress server (default: {env_threads})')
+    parser.add_argument('--pretty', action=argparse.BooleanOptionalAction, default=env_pretty,
+                        help='Pretty print the XML views (default: enabled)')
+    parser.add_argument('--flush-on-exit', action=argparse.BooleanOptionalAction, default=True,
+                        help='Write a changed state to the data file on shutdown (default: enabled)')
+
+    # Fault injection, ENDPOINT is one of static, dynamic, cyclic, changes or all
+    faults_group = parser.add_argument_group('fault injection', 'Can be changed at runtime via /admin/faults')
+    faults_group.add_argument('--faults', type=str, default=env_faults,
+                              help='Fault settings as JSON, like the body of PUT /admin/faults')
+    faults_group.add_argument('--latency', action='append', default=[], metavar='ENDPOINT=SPEC',
+                              help='Latency in ms: 200, uniform:50:500, normal:200:50, lognormal:200:0.5 or exp:200')
+    faults_group.add_argument('--error-rate', action='append', default=[], metavar='ENDPOINT=RATE',
+                              help='Share of requests answered with --error-status')
+    faults_group.add_argument('--error-status', type=int, default=500,
+                              help='HTTP status of injected errors (default: 500)')
+    faults_group.add_argument('--reset-rate', action='append', default=[], metavar='ENDPOINT=RATE',
+                              help='Share of requests whose connection breaks off mid-response')
+    faults_group.add_argument('--truncate-rate', action='append', default=[], metavar='ENDPOINT=RATE',
+                              help='Share of requests answered with a truncated XML document')
+    faults_group.add_argument('--hang', action='append', default=[], metavar='ENDPOINT',
+                              help='Hold requests to ENDPOINT until hang is switched off, at most --hang-timeout')
+    faults_group.add_argument('--hang-timeout', type=float, default=env_hang_timeout,
+                              help=f'Seconds a hanging request is held before its connection breaks off (default: {env_hang_timeout})')
+    faults_group.add_argument('--fault-seed', type=int,
+                              help='Seed of the injected faults and latencies, for reproducible runs')
     
     args = parser.parse_args()
+
+    try:
+        if args.faults:
+            set_faults(json.loads(args.faults))
+        settings = {}
+        for key, values in (('latency', args.latency), ('error_rate', args.error_rate),
+                            ('reset_rate', args.reset_rate), ('truncate_rate', args.truncate_rate)):
+            for value in values:
+                endpoint, _, setting = value.partition('=')
+                settings.setdefault(endpoint, {})[key] = setting if key == 'latency' else float(setting)
+        for endpoint in args.hang:
+            settings.setdefault(endpoint, {})['hang'] = True
+        if args.error_status != 500:
+            settings.setdefault('all', {})['error_status'] = args.error_status
+        set_faults(settings)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.fault_seed is not None:
+        fault_random.seed(args.fault_seed)
     
     # Update global data file path
-    global DATA_FILE
+    global DATA_FILE, IN_MEMORY, FLUSH_INTERVAL, PRETTY_PRINT, HANG_TIMEOUT
     DATA_FILE = args.data_file
+    IN_MEMORY = args.in_memory
+    FLUSH_INTERVAL = args.flush_interval
+    PRETTY_PRINT = args.pretty
+    HANG_TIMEOUT = args.hang_timeout
     
     return args
 
@@ -557,10 +941,31 @@ if __name__ == '__main__':
     print(f"  Host: {args.host}")
     print(f"  Port: {args.port}")
     print(f"  Debug: {args.debug}")
-    print(f"  Data file: {DATA_FILE}")
+    print(f"  Server: {args.server}" + (f" ({args.threads} threads)" if args.server == "waitress" else ""))
+    print(f"  Data file: {'(in memory)' if IN_MEMORY else DATA_FILE}")
+    injected = {
+        endpoint: {key: value for key, value in settings.items() if value != FAULT_DEFAULTS[key]}
+        for endpoint, settings in faults.items()
+    }
+    for endpoint, settings in injected.items():
+        if settings:
+            print(f"  Faults ({endpoint}): {settings}")
     
     # Ensure we have initial data
-    init_data()
+    get_data()
+
+    if not IN_MEMORY:
+        threading.Thread(target=flush_loop, daemon=True).start()
+        if args.flush_on_exit:
+            atexit.register(flush_data)
+            # Run the atexit handlers on SIGTERM as well
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
     # Run the server
-    app.run(host=args.host, port=args.port, debug=args.debug)
\ No newline at end of file
+    if args.server == "waitress":
+        # Imported here so the development server works without waitress installed
+        from waitress import serve
+        hang_slots = threading.BoundedSemaphore(max(1, args.threads - 1))
+        serve(app, host=args.host, port=args.port, threads=args.threads)
+    else:
+        app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
\ No newline at end of file
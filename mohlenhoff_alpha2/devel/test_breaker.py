@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Checks of the CircuitBreaker states, without any server.
+
+    python -m unittest test_breaker
+"""
+import os
+import sys
+import logging
+import unittest
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_breaker import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.probes = []
+        self.reachable = False
+
+    def probe(self):
+        self.probes.append(self.reachable)
+        return self.reachable
+
+    def create_breaker(self, base_delay=0):
+        # Without a delay the next request after opening probes right away
+        return CircuitBreaker('test', self.probe, failure_threshold=3, base_delay=base_delay, max_delay=base_delay)
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = self.create_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.closed)
+
+        breaker.record_failure()
+
+        self.assertFalse(breaker.closed)
+
+    def test_success_resets_the_failures(self):
+        breaker = self.create_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+
+        breaker.record_failure()
+
+        self.assertTrue(breaker.closed)
+
+    def test_open_circuit_rejects_without_probing_until_the_backoff_expired(self):
+        breaker = self.create_breaker(base_delay=60)
+        for _ in range(3):
+            breaker.record_failure()
+
+        self.assertFalse(breaker.allow())
+        self.assertEqual(self.probes, [])
+
+    def test_failed_probe_keeps_the_circuit_open(self):
+        breaker = self.create_breaker()
+        for _ in range(3):
+            breaker.record_failure()
+
+        self.assertFalse(breaker.allow())
+        self.assertEqual(self.probes, [False])
+        self.assertFalse(breaker.closed)
+
+    def test_successful_probe_closes_the_circuit_and_notifies(self):
+        breaker = self.create_breaker()
+        closed = []
+        breaker.subscribe(lambda: closed.append(True))
+        for _ in range(3):
+            breaker.record_failure()
+        self.reachable = True
+
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.closed)
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    # Opening and probing the circuit is logged as a warning
+    logging.disable(logging.WARNING)
+    unittest.main()
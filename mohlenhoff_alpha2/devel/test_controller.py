@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Checks of the warm restart of a ControllerWorker from its cached state.
+
+Starts mock_server.py like bench_integration.py.
+
+    python -m unittest test_controller
+"""
+import os
+import sys
+import logging
+import tempfile
+import threading
+import unittest
+
+from bench_integration import free_port, start_server
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_client import create_session
+from alpha2_controller import ControllerWorker
+from alpha2_state import StateStore
+
+DEVICES = [{'name': 'Living Room', 'area_id': 1}, {'name': 'Hall', 'area_id': 2}]
+
+
+class WarmRestartTest(unittest.TestCase):
+    def setUp(self):
+        port = free_port()
+        self.host = f"127.0.0.1:{port}"
+        self.server = start_server('mock_server.py', port, '--in-memory')
+        self.addCleanup(self.stop_server)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = StateStore(os.path.join(directory.name, 'state.json'))
+        self.session = create_session()
+
+        self.static_reads = 0
+        self.session.hooks['response'].append(self.count_static_reads)
+
+    def stop_server(self):
+        self.server.terminate()
+        self.server.wait()
+
+    def count_static_reads(self, response, *args, **kwargs):
+        if response.request.url.endswith('/data/static.xml'):
+            self.static_reads += 1
+
+    def create_worker(self, host=None, devices=DEVICES):
+        return ControllerWorker('default', host or self.host, [dict(device) for device in devices],
+                                self.session, (1, 2), store=self.store)
+
+    def set_up_in_background(self, worker):
+        threading.Thread(target=worker.setup, daemon=True).start()
+        return worker.ready.wait(1)
+
+    def test_cold_start_caches_the_virtual_devices(self):
+        worker = self.create_worker()
+        worker.setup()
+
+        cached = self.store.get('default')
+        self.assertIsNotNone(cached['device_id'])
+        self.assertEqual(sorted(cached['virtual_devices']), ['1', '2'])
+
+    def test_warm_start_sends_without_the_base_station(self):
+        self.create_worker().setup()
+        self.stop_server()
+
+        worker = self.create_worker()
+
+        self.assertTrue(self.set_up_in_background(worker))
+        self.assertEqual(worker.client.device_id, self.store.get('default')['device_id'])
+
+    def test_warm_start_skips_static_xml(self):
+        self.create_worker().setup()
+        self.static_reads = 0
+
+        worker = self.create_worker()
+        # Only the background check may read it
+        worker.revalidate = lambda: None
+        worker.setup()
+
+        self.assertEqual(self.static_reads, 0)
+
+    def test_uncached_area_waits_for_the_base_station(self):
+        self.create_worker(devices=DEVICES[:1]).setup()
+        self.stop_server()
+
+        worker = self.create_worker()
+
+        self.assertEqual(worker.uncached_areas(), [2])
+        self.assertFalse(self.set_up_in_background(worker))
+
+    def test_stop_ends_the_retries_of_the_setup(self):
+        self.stop_server()
+        worker = self.create_worker()
+        thread = threading.Thread(target=worker.setup, daemon=True)
+        thread.start()
+
+        worker.stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(worker.ready.is_set())
+
+    def test_revalidate_replaces_a_deleted_virtual_device(self):
+        worker = self.create_worker()
+        worker.setup()
+        iodevice_id = worker.virtual_devices[1]
+        worker.client.delete_virtual_device(iodevice_id)
+
+        worker.revalidate()
+
+        self.assertNotEqual(worker.virtual_devices[1], iodevice_id)
+        self.assertEqual(self.store.get('default')['virtual_devices']['1'], worker.virtual_devices[1])
+
+
+if __name__ == '__main__':
+    # The unreachable base station is logged as an error
+    logging.disable(logging.ERROR)
+    unittest.main()
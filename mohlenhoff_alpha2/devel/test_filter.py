@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Checks of the RingBuffer and the sensor filters.
+
+    python -m unittest test_filter
+"""
+import os
+import sys
+import unittest
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_filter import RingBuffer, MovingAverage, MovingMedian, ExponentialAverage, create_filter
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_keeps_the_last_readings(self):
+        buffer = RingBuffer(3)
+        for value in (1, 2, 3, 4, 5):
+            buffer.append(value)
+
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(sorted(buffer.values()), [3.0, 4.0, 5.0])
+
+    def test_partially_filled(self):
+        buffer = RingBuffer(3)
+        buffer.append(1)
+
+        self.assertEqual(list(buffer.values()), [1.0])
+
+    def test_clear(self):
+        buffer = RingBuffer(3)
+        buffer.append(1)
+        buffer.clear()
+        buffer.append(2)
+
+        self.assertEqual(list(buffer.values()), [2.0])
+
+
+class FilterTest(unittest.TestCase):
+    def test_moving_average(self):
+        average = MovingAverage(2)
+        average.add(20)
+        average.add(21)
+
+        self.assertEqual(average.add(23), 22.0)
+
+    def test_moving_median_ignores_an_outlier(self):
+        median = MovingMedian(3)
+        median.add(20)
+        median.add(20.5)
+
+        self.assertEqual(median.add(35), 20.5)
+
+    def test_moving_median_of_an_even_count(self):
+        median = MovingMedian(4)
+        median.add(20)
+
+        self.assertEqual(median.add(21), 20.5)
+
+    def test_exponential_average(self):
+        ema = ExponentialAverage(0.5)
+        ema.add(20)
+
+        self.assertEqual(ema.add(22), 21.0)
+
+    def test_reset_starts_over(self):
+        ema = ExponentialAverage(0.5)
+        ema.add(20)
+        ema.reset()
+
+        self.assertEqual(ema.add(22), 22.0)
+
+    def test_create_filter(self):
+        self.assertIsNone(create_filter('none'))
+        self.assertIsInstance(create_filter('median', window=3), MovingMedian)
+        with self.assertRaises(ValueError):
+            create_filter('kalman')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Checks of the stdlib HTTPSession against a local http.server.
+
+    python -m unittest test_http
+"""
+import os
+import sys
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_integration import free_port
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_http import HTTPSession
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the base station and Home Assistant
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.reply(200, {'path': self.path})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.reply(200, {'body': body.decode('utf-8'), 'content_type': self.headers.get('Content-Type')})
+
+    def reply(self, status, value):
+        body = json.dumps(value).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.session = HTTPSession()
+        self.addCleanup(self.session.close)
+
+    def test_get(self):
+        response = self.session.get(f"{self.url}/api/states?x=1", timeout=5)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'path': '/api/states?x=1'})
+
+    def test_post_json(self):
+        response = self.session.post(f"{self.url}/api/states", json={'state': 21.5}, timeout=5)
+
+        self.assertEqual(response.json(), {'body': '{"state": 21.5}', 'content_type': 'application/json'})
+
+    def test_streamed_body(self):
+        with self.session.get(self.url, timeout=5, stream=True) as response:
+            body = b''.join(response.iter_content(4))
+
+        self.assertEqual(json.loads(body), {'path': '/'})
+
+    def test_connection_is_reused(self):
+        for _ in range(3):
+            self.session.get(self.url, timeout=5)
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_refused_connection_raises(self):
+        with self.assertRaises(OSError):
+            self.session.get(f"http://127.0.0.1:{free_port()}/", timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Checks of how the integration reads Home Assistant states, without any server.
+
+    python -m unittest test_integration
+"""
+import os
+import sys
+import json
+import logging
+import unittest
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+
+def state(entity_id, value, **attributes):
+    return {'entity_id': entity_id, 'state': value, 'attributes': attributes}
+
+
+class IntegrationTestCase(unittest.TestCase):
+    def create_integration(self, *devices):
+        from alpha2_integration import Alpha2Integration
+
+        environ = dict(os.environ)
+        self.addCleanup(os.environ.clear)
+        self.addCleanup(os.environ.update, environ)
+        os.environ.update({
+            'ALPHA2_HOST': '127.0.0.1:1',
+            'STATE_PATH': os.path.join(DEVEL_DIR, 'no-such-directory', 'state.json'),
+            'VIRTUAL_DEVICES': json.dumps(list(devices)),
+        })
+        return Alpha2Integration()
+
+    def sent(self, integration):
+        """Temperatures handed to each worker, by controller and area"""
+        return {name: worker.take_pending()[0] for name, worker in integration.workers.items()}
+
+
+class ExtractTemperatureTest(IntegrationTestCase):
+    def setUp(self):
+        self.integration = self.create_integration(
+            {"name": "Living Room", "area_id": 1, "temperature_entity_id": "sensor.living_room"},
+            {"name": "Hall", "area_id": 2, "temperature_entity_id": "climate.hall"},
+        )
+
+    def test_state(self):
+        self.assertEqual(self.integration.extract_temperature('sensor.living_room', state('sensor.living_room', '21.5')), 21.5)
+
+    def test_attribute(self):
+        data = state('climate.hall', 'heat', temperature=20)
+        self.assertEqual(self.integration.extract_temperature('climate.hall', data), 20.0)
+
+    def test_null_attribute(self):
+        data = state('climate.hall', 'off', temperature=None)
+        self.assertIsNone(self.integration.extract_temperature('climate.hall', data))
+
+    def test_non_numeric_attribute(self):
+        data = state('climate.hall', 'heat', temperature='warm')
+        self.assertIsNone(self.integration.extract_temperature('climate.hall', data))
+
+    def test_bad_entity_does_not_stop_the_others(self):
+        self.integration.dispatch_states({
+            'sensor.living_room': state('sensor.living_room', '21.5'),
+            'climate.hall': state('climate.hall', 'off', temperature=None),
+        })
+
+        self.assertEqual(self.sent(self.integration), {'default': {1: 21.5}})
+
+
+class SharedAreaFilterTest(IntegrationTestCase):
+    def setUp(self):
+        self.integration = self.create_integration(
+            {"name": "Living Room", "area_id": 1, "temperature_entity_id": "sensor.living_room",
+             "filter": "median", "filter_window": 3},
+            {"name": "Bedroom", "area_id": 1, "temperature_entity_id": "sensor.bedroom",
+             "filter": "median", "filter_window": 3},
+        )
+
+    def poll(self, living_room, bedroom):
+        self.integration.dispatch_states({
+            'sensor.living_room': state('sensor.living_room', living_room),
+            'sensor.bedroom': state('sensor.bedroom', bedroom),
+        })
+        return self.sent(self.integration)['default']
+
+    def test_every_sensor_is_filtered_before_the_area_is_combined(self):
+        self.poll('20', '18')
+        self.poll('20', '18')
+
+        # An outlier of one sensor doesn't get through its median
+        self.assertEqual(self.poll('30', '18'), {1: 19.0})
+
+    def test_unavailable_sensor_restarts_only_its_filter(self):
+        self.poll('20', '18')
+        self.poll('unavailable', '18')
+
+        self.assertEqual(self.poll('22', '18'), {1: 20.0})
+
+    def test_websocket_change_adds_one_reading(self):
+        self.poll('20', '18')
+        self.poll('20', '18')
+
+        self.integration.on_state_changed('sensor.living_room', state('sensor.living_room', '30'))
+        self.integration.on_state_changed('sensor.living_room', state('sensor.living_room', '30'))
+
+        self.assertEqual(self.sent(self.integration)['default'], {1: 24.0})
+
+
+class ClimateTargetTest(IntegrationTestCase):
+    def setUp(self):
+        self.integration = self.create_integration(
+            {"name": "Hall", "area_id": 1, "temperature_entity_id": "sensor.hall", "target_entity_id": "climate.hall"},
+        )
+        self.worker = self.integration.workers['default']
+
+    def poll(self, target_state, target):
+        self.integration.dispatch_states({
+            'sensor.hall': state('sensor.hall', '20.5'),
+            'climate.hall': state('climate.hall', target_state, temperature=target),
+        })
+        return self.worker.take_pending()
+
+    def test_thermostat_that_is_off_sets_no_target(self):
+        self.poll('heat', 21)
+
+        temperatures, targets = self.poll('off', None)
+
+        self.assertEqual(temperatures, {1: 20.5})
+        self.assertEqual(targets, {})
+
+    def test_target_is_set_once_the_thermostat_is_on_again(self):
+        self.poll('heat', 21)
+        self.poll('off', None)
+
+        _, targets = self.poll('heat', 22)
+
+        self.assertEqual(targets, {1: 22.0})
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    unittest.main()
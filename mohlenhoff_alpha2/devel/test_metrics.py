@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Checks of the Prometheus text format of the metrics.
+
+    python -m unittest test_metrics
+"""
+import os
+import sys
+import logging
+import unittest
+
+import requests
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_metrics import Registry, Counter, Gauge, Histogram, start_metrics_server
+
+
+class MetricsFormatTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        counter = self.registry.register(Counter('test_total', 'Things'))
+        counter.inc(controller='default', area=2)
+        counter.inc(2, area=2, controller='default')
+
+        self.assertEqual(self.registry.render(), (
+            '# HELP test_total Things\n'
+            '# TYPE test_total counter\n'
+            'test_total{area="2",controller="default"} 3\n'
+        ))
+
+    def test_gauge_without_labels(self):
+        gauge = self.registry.register(Gauge('test_open', 'Open'))
+        gauge.set(1)
+
+        self.assertTrue(self.registry.render().endswith('test_open 1\n'))
+
+    def test_histogram(self):
+        histogram = self.registry.register(Histogram('test_seconds', 'Durations', buckets=(0.1, 1.0)))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        self.assertEqual(self.registry.render().splitlines()[2:], [
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1.0"} 2',
+            'test_seconds_bucket{le="+Inf"} 3',
+            'test_seconds_sum 5.55',
+            'test_seconds_count 3',
+        ])
+
+    def test_server(self):
+        self.registry.register(Counter('test_total', 'Things')).inc()
+        server = start_metrics_server(port=0, host='127.0.0.1', registry=self.registry)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        response = requests.get(f"{url}/metrics", timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('test_total 1\n', response.text)
+        self.assertEqual(requests.get(f"{url}/other", timeout=5).status_code, 404)
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    unittest.main()
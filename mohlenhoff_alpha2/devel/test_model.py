@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Checks of the change detection of Alpha2Model.
+
+    python -m unittest test_model
+"""
+import os
+import sys
+import logging
+import unittest
+import xml.etree.ElementTree as ET
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_model import Alpha2Model, Change
+
+STATIC = """<Devices><Device>
+<ID>Alpha2_1</ID>
+<HEATAREA nr="1"><HEATAREA_NAME>Hall</HEATAREA_NAME><T_ACTUAL>20.5</T_ACTUAL></HEATAREA>
+<HEATAREA nr="2"><HEATAREA_NAME>Bath</HEATAREA_NAME><T_ACTUAL>22.0</T_ACTUAL></HEATAREA>
+<IODEVICE nr="1"><IODEVICE_TYPE>8</IODEVICE_TYPE><IODEVICE_ID>7</IODEVICE_ID><HEATAREA_NR>1</HEATAREA_NR></IODEVICE>
+</Device></Devices>"""
+
+
+def children(xml):
+    return list(ET.fromstring(xml).find('Device'))
+
+
+class Alpha2ModelTest(unittest.TestCase):
+    def setUp(self):
+        self.model = Alpha2Model()
+        self.model.apply(children(STATIC), complete=True)
+
+    def test_static_load(self):
+        self.assertTrue(self.model.loaded)
+        self.assertEqual(self.model.device.id, 'Alpha2_1')
+        self.assertEqual(self.model.heat_areas[2].t_actual, 22.0)
+        self.assertEqual(self.model.iodevices_by_type()[8][0].id, 7)
+
+    def test_same_document_changes_nothing(self):
+        self.assertEqual(self.model.apply(children(STATIC), complete=True), [])
+
+    def test_changed_value(self):
+        changes = self.model.apply(children(
+            '<Devices><Device><HEATAREA nr="1"><T_ACTUAL>21.0</T_ACTUAL></HEATAREA></Device></Devices>'
+        ))
+
+        self.assertEqual(changes, [Change('heat_area', 1, 't_actual', 20.5, 21.0)])
+
+    def test_partial_document_keeps_missing_elements(self):
+        self.model.apply(children('<Devices><Device><HEATAREA nr="1"><T_ACTUAL>21.0</T_ACTUAL></HEATAREA></Device></Devices>'))
+
+        self.assertIn(2, self.model.heat_areas)
+
+    def test_complete_document_removes_missing_elements(self):
+        changes = self.model.apply(children(STATIC.replace(
+            '<HEATAREA nr="2"><HEATAREA_NAME>Bath</HEATAREA_NAME><T_ACTUAL>22.0</T_ACTUAL></HEATAREA>', ''
+        )), complete=True)
+
+        self.assertEqual([(change.kind, change.nr, change.attribute) for change in changes], [('heat_area', 2, None)])
+        self.assertNotIn(2, self.model.heat_areas)
+
+    def test_listeners_receive_the_changes(self):
+        received = []
+        self.model.subscribe(received.append)
+
+        self.model.apply(children(STATIC))
+        self.model.apply(children('<Devices><Device><ID>Alpha2_2</ID></Device></Devices>'))
+
+        self.assertEqual(received, [[Change('device', None, 'id', 'Alpha2_1', 'Alpha2_2')]])
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    unittest.main()
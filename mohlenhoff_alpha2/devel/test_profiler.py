@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Checks of the limits of the SamplingProfiler.
+
+    python -m unittest test_profiler
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+import unittest
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_profiler import SamplingProfiler
+
+
+class SamplingProfilerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.profiler = SamplingProfiler(self.directory, seconds=0.05, cooldown=60, keep=2)
+
+    def wait_until_done(self):
+        deadline = time.monotonic() + 5
+        while self.profiler._running and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def profiles(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith('profile-'))
+
+    def test_slow_cycles_start_one_profile_per_cooldown(self):
+        self.assertTrue(self.profiler.start(automatic=True))
+        self.wait_until_done()
+
+        self.assertFalse(self.profiler.start(automatic=True))
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_signal_ignores_the_cooldown(self):
+        self.assertTrue(self.profiler.start(automatic=True))
+        self.wait_until_done()
+
+        self.assertTrue(self.profiler.start())
+
+    def test_only_the_newest_profiles_are_kept(self):
+        for name in ('profile-20260101-000000.txt', 'profile-20260102-000000.txt', 'profile-20260103-000000.txt'):
+            with open(os.path.join(self.directory, name), 'w') as f:
+                f.write('main 1\n')
+
+        self.profiler.start()
+        self.wait_until_done()
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0], 'profile-20260103-000000.txt')
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Checks of the StateStore cached in /data.
+
+    python -m unittest test_state
+"""
+import os
+import sys
+import logging
+import tempfile
+import unittest
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+from alpha2_state import StateStore
+
+STATE = {'device_id': 'Alpha2_1', 'virtual_devices': {'1': 7}}
+
+
+class StateStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, 'state.json')
+
+    def test_flushed_state_is_loaded_again(self):
+        store = StateStore(self.path)
+        store.update('default', STATE)
+        store.flush()
+
+        self.assertEqual(StateStore(self.path).get('default'), STATE)
+
+    def test_missing_file(self):
+        self.assertIsNone(StateStore(self.path).get('default'))
+
+    def test_unreadable_file_is_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write('{"controllers":')
+
+        self.assertIsNone(StateStore(self.path).get('default'))
+
+    def test_unchanged_state_is_not_written(self):
+        StateStore(self.path).flush()
+
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_failed_write_is_retried(self):
+        path = os.path.join(self.directory, 'data', 'state.json')
+        store = StateStore(path)
+        store.update('default', STATE)
+        store.flush()
+
+        os.mkdir(os.path.dirname(path))
+        store.flush()
+
+        self.assertEqual(StateStore(path).get('default'), STATE)
+
+
+if __name__ == '__main__':
+    # The unreadable and unwritable files are logged
+    logging.disable(logging.ERROR)
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Checks of the WebSocket mode of the integration against the mock servers.
+
+Starts mock_server.py and mock_ha_server.py like bench_integration.py and
+counts the changes.xml requests the integration sends to the base station.
+
+    python -m unittest test_websocket
+"""
+import os
+import sys
+import json
+import time
+import logging
+import unittest
+
+import requests
+
+from bench_integration import free_port, start_server, workers_idle
+
+DEVEL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DEVEL_DIR, '..', 'rootfs', 'usr', 'bin'))
+
+ENTITY_ID = 'sensor.websocket_test'
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class WebSocketModeTest(unittest.TestCase):
+    def setUp(self):
+        alpha2_port = free_port()
+        ha_port = free_port()
+        self.ha_url = f"http://127.0.0.1:{ha_port}"
+        self.servers = [
+            start_server('mock_server.py', alpha2_port, '--in-memory'),
+            start_server('mock_ha_server.py', ha_port, '--entity', f"{ENTITY_ID}=20.5"),
+        ]
+        self.addCleanup(self.stop_servers)
+
+        self.environ = dict(os.environ)
+        self.addCleanup(os.environ.clear)
+        self.addCleanup(os.environ.update, self.environ)
+        os.environ.update({
+            'ALPHA2_HOST': f"127.0.0.1:{alpha2_port}",
+            'SUPERVISOR_URL': self.ha_url,
+            'USE_WEBSOCKET': 'true',
+            'UPDATE_INTERVAL': '60',
+            'VIRTUAL_DEVICES': json.dumps([
+                {"name": "WebSocket", "area_id": 1, "temperature_entity_id": ENTITY_ID},
+            ]),
+        })
+
+    def stop_servers(self):
+        for server in self.servers:
+            server.terminate()
+            server.wait()
+
+    def start_integration(self, max_update_age):
+        from alpha2_integration import Alpha2Integration
+
+        os.environ['MAX_UPDATE_AGE'] = str(max_update_age)
+        integration = Alpha2Integration()
+
+        self.sent = []
+        integration.session.hooks['response'].append(self.record_sent)
+
+        for worker in integration.workers.values():
+            worker.start()
+            worker.ready.wait()
+        integration.start_websocket()
+        self.addCleanup(integration.ws_listener.stop)
+
+        self.assertTrue(wait_for(lambda: integration.ws_listener.connected))
+        # The subscription starts with the current state, which is sent once
+        self.assertTrue(wait_for(lambda: self.sent == [20.5]))
+        return integration
+
+    def record_sent(self, response, *args, **kwargs):
+        if response.request.method == 'POST' and response.request.url.endswith('/data/changes.xml'):
+            body = response.request.body.decode() if isinstance(response.request.body, bytes) else response.request.body
+            if '<T_ACTUAL>' in body:
+                self.sent.append(float(body.split('<T_ACTUAL>')[1].split('</T_ACTUAL>')[0]))
+
+    def run_cycle(self, integration):
+        integration.run_cycle()
+        self.assertTrue(wait_for(lambda: workers_idle(integration)))
+
+    def test_change_is_forwarded(self):
+        integration = self.start_integration(max_update_age=600)
+
+        requests.post(f"{self.ha_url}/api/states/{ENTITY_ID}", json={"state": "21.5"})
+
+        self.assertTrue(wait_for(lambda: self.sent == [20.5, 21.5]))
+        self.assertEqual(integration.temperatures, {'default': {1: 21.5}})
+
+    def test_stable_sensor_is_not_resent(self):
+        integration = self.start_integration(max_update_age=600)
+
+        for _ in range(3):
+            self.run_cycle(integration)
+
+        self.assertEqual(self.sent, [20.5])
+
+    def test_stable_sensor_gets_heartbeat(self):
+        integration = self.start_integration(max_update_age=1)
+
+        time.sleep(1.1)
+        self.run_cycle(integration)
+        self.run_cycle(integration)
+
+        # The second cycle ran before the heartbeat was due again
+        self.assertEqual(self.sent, [20.5, 20.5])
+
+    def test_unavailable_sensor_gets_no_heartbeat(self):
+        integration = self.start_integration(max_update_age=1)
+
+        requests.post(f"{self.ha_url}/api/states/{ENTITY_ID}", json={"state": "unavailable"})
+        self.assertTrue(wait_for(lambda: integration.temperatures == {'default': {}}))
+        time.sleep(1.1)
+        self.run_cycle(integration)
+
+        self.assertEqual(self.sent, [20.5])
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import contextlib
+
+import aiohttp
+
+from alpha2_client import build_update_xml, CONNECT_TIMEOUT, READ_TIMEOUT, POOL_SIZE
+from alpha2_metrics import CHANGES_POST_SECONDS
+from alpha2_trace import span
+
+
+def create_async_session(pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                         trace_configs=None):
+    """Create a keep-alive aiohttp session with connect and read timeouts"""
+    connector = aiohttp.TCPConnector(limit=pool_size)
+    timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=trace_configs)
+
+
+async def breaker_allows(breaker):
+    """CircuitBreaker.allow() for coroutines
+
+    The probe of an open circuit is a blocking request, so it runs in a
+    thread instead of on the event loop.
+    """
+    return breaker.closed or await asyncio.to_thread(breaker.allow)
+
+
+class AsyncAlpha2Client:
+    """asyncio counterpart of Alpha2Client for the monitor loop"""
+
+    def __init__(self, host, device_id, session, breaker=None, semaphore=None):
+        self.host = host
+        self.api_url = f"http://{host}/data/changes.xml"
+        self.device_id = device_id
+        self.session = session
+        self.breaker = breaker
+        self.semaphore = semaphore or contextlib.nullcontext()
+        self.logger = logging.getLogger(__name__)
+
+    async def update_temperatures(self, temperatures):
+        """Update the actual temperature for several heating areas in one request"""
+        if not temperatures:
+            return True
+        if self.device_id is None:
+            self.logger.error(f"Device ID of {self.host} is unknown, not sending command")
+            return False
+
+        with span('build_xml', areas=len(temperatures)):
+            xml = build_update_xml(self.device_id, temperatures)
+        return await self._send_command(xml)
+
+    async def set_target_temperature(self, area_id, temperature):
+        """Set the target temperature for a heating area"""
+        if self.device_id is None:
+            self.logger.error(f"Device ID of {self.host} is unknown, not sending command")
+            return False
+
+        with span('build_xml', areas=1):
+            xml = build_update_xml(self.device_id, {area_id: temperature}, 'T_TARGET')
+        return await self._send_command(xml)
+
+    async def _send_command(self, xml_data):
+        if self.breaker and not await breaker_allows(self.breaker):
+            self.logger.debug(f"Circuit to {self.host} is open, not sending command")
+            return False
+
+        try:
+            headers = {'Content-Type': 'application/xml'}
+            async with self.semaphore:
+                with CHANGES_POST_SECONDS.time(), span('alpha2_post', host=self.host):
+                    async with self.session.post(self.api_url, data=xml_data, headers=headers) as response:
+                        body = await response.text()
+
+            if self.breaker:
+                if response.status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+
+            if response.status == 200:
+                self.logger.info("Command sent successfully")
+                return True
+            else:
+                self.logger.error(f"Failed to send command: {response.status}, {body}")
+                return False
+        except Exception as e:
+            if self.breaker:
+                self.breaker.record_failure()
+            self.logger.error(f"Error communicating with Alpha 2: {e}")
+            return False
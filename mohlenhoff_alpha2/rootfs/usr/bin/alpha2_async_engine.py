@@ -0,0 +1,143 @@
+import time
+import asyncio
+import logging
+from alpha2_async_client import AsyncAlpha2Client, breaker_allows, create_async_session
+from alpha2_metrics import HA_FETCH_SECONDS, SEND_SECONDS
+from alpha2_trace import trace, span
+
+logger = logging.getLogger('alpha2-integration')
+
+
+def run(integration):
+    """Run the monitor loop of an Alpha2Integration and its workers on an asyncio event loop"""
+    asyncio.run(monitor_temperatures(integration))
+
+
+async def monitor_temperatures(integration):
+    """Monitor temperature sensors and send them with a task per ControllerWorker"""
+    interval = integration.config['update_interval']
+    logger.info(f"Starting async temperature monitoring with interval {interval} seconds")
+    # Bounds the requests the workers send to their base stations at the same time
+    semaphore = asyncio.Semaphore(integration.config.get('max_parallel_requests', 4))
+
+    async with create_async_session() as session:
+        await asyncio.gather(
+            run_cycles(integration, session, interval),
+            *(run_worker(worker, session, semaphore) for worker in integration.workers.values()),
+        )
+
+
+async def run_cycles(integration, session, interval):
+    while True:
+        await run_cycle(integration, session)
+
+        # Wait before next check
+        await asyncio.sleep(interval)
+
+
+async def run_cycle(integration, session):
+    """Run one cycle of the monitor loop, the counterpart of Alpha2Integration.run_cycle()"""
+    with trace('cycle', integration.trace_threshold) as cycle:
+        try:
+            if integration.ws_listener and integration.ws_listener.connected:
+                logger.debug("Receiving state changes via WebSocket, skipping REST poll")
+                integration.resend_temperatures()
+            else:
+                integration.dispatch_states(await poll_states(integration, session))
+
+        except Exception as e:
+            logger.error(f"Error in temperature monitoring loop: {e}")
+
+    integration.record_cycle(cycle.duration)
+
+
+async def poll_states(integration, session):
+    """Fetch the current state of every configured entity in a single request"""
+    breaker = integration.ha_breaker
+    if not await breaker_allows(breaker):
+        logger.debug("Circuit to Home Assistant is open, skipping REST poll")
+        return None
+
+    logger.debug(f"Fetching states of {len(integration.entity_ids)} entities")
+    try:
+        with HA_FETCH_SECONDS.time(), span('ha_fetch'):
+            async with session.get(f"{integration.ha_url}/api/states", headers=integration.ha_headers) as response:
+                if response.status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                if response.status != 200:
+                    logger.error(f"Failed to get states from Home Assistant: {response.status}")
+                    return {}
+
+                with span('json_decode'):
+                    return integration.select_states(await response.json())
+    except Exception as e:
+        breaker.record_failure()
+        logger.error(f"Error getting states from Home Assistant: {e}")
+        return None
+
+
+async def run_worker(worker, session, semaphore=None):
+    """Run a ControllerWorker as an asyncio task using the async client
+
+    A semaphore shared by the workers bounds their concurrent requests.
+    """
+    event = asyncio.Event()
+    worker.use_event_loop(asyncio.get_running_loop(), event)
+
+    try:
+        await asyncio.to_thread(worker.setup)
+    except asyncio.CancelledError:
+        # asyncio.run() waits for the thread, which may be retrying to read the inventory
+        worker.stop()
+        raise
+    alpha2 = AsyncAlpha2Client(
+        worker.host, worker.client.device_id, session, breaker=worker.client.breaker, semaphore=semaphore
+    )
+
+    next_mirror = time.monotonic()
+    while True:
+        try:
+            await asyncio.wait_for(event.wait(), worker.mirror_timeout(next_mirror))
+        except asyncio.TimeoutError:
+            pass
+        else:
+            event.clear()
+            # The background revalidation may have read a new device ID
+            alpha2.device_id = worker.client.device_id
+            try:
+                temperatures, targets = worker.take_pending()
+                with SEND_SECONDS.time(controller=worker.name), trace('send', worker.trace_threshold, controller=worker.name):
+                    await push_temperatures(worker, alpha2, temperatures)
+                    await push_targets(worker, alpha2, targets)
+                if targets:
+                    next_mirror = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error sending temperatures to controller {worker.name}: {e}")
+            finally:
+                worker.done_sending()
+
+        if worker.mirror is not None and time.monotonic() >= next_mirror:
+            next_mirror = time.monotonic() + worker.mirror_interval
+            try:
+                # The mirror shares the blocking session with the setup
+                with trace('mirror', worker.trace_threshold, controller=worker.name):
+                    await asyncio.to_thread(worker.mirror.sync, worker.client)
+            except Exception as e:
+                logger.error(f"Error mirroring controller {worker.name}: {e}")
+
+
+async def push_temperatures(worker, alpha2, temperatures):
+    """Update Alpha 2 with the changed temperatures using the async client"""
+    changed, now = worker.select_changed(temperatures)
+    if changed:
+        worker.record_sent(changed, now, await alpha2.update_temperatures(changed))
+
+
+async def push_targets(worker, alpha2, targets):
+    """Set the target temperatures changed in Home Assistant using the async client"""
+    for area_id, target in worker.select_targets(targets).items():
+        with span('set_target', area=area_id):
+            worker.record_target(area_id, await alpha2.set_target_temperature(area_id, target))
@@ -0,0 +1,112 @@
+import time
+import random
+import logging
+import threading
+from alpha2_metrics import CIRCUIT_OPEN, CIRCUIT_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failed requests that open the circuit
+FAILURE_THRESHOLD = 3
+
+# Seconds until the first probe, doubled after every failed probe up to MAX_DELAY
+BASE_DELAY = 5
+MAX_DELAY = 300
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of sending a request while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Stops requests to an unreachable endpoint until a probe gets through
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests are rejected without touching the network. Once the backoff
+    expired, the next request runs probe() instead, a single cheap request
+    returning True if the endpoint answers. A successful probe closes the
+    circuit, a failed one doubles the backoff. The backoff is randomized so
+    several add-ons don't probe a recovering endpoint at the same time.
+    """
+
+    def __init__(self, name, probe, failure_threshold=FAILURE_THRESHOLD, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._delay = base_delay
+        self._retry_at = 0.0
+        self._listeners = []
+        CIRCUIT_OPEN.set(0, endpoint=name)
+
+    @property
+    def closed(self):
+        return self.state == CLOSED
+
+    def subscribe(self, listener):
+        """Call listener() whenever the circuit closes after the endpoint was unreachable"""
+        self._listeners.append(listener)
+
+    def allow(self):
+        """Check if a request may be sent, probing the endpoint once the backoff expired"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            # Only one caller probes, the others are rejected until it finished
+            if self.state == HALF_OPEN or time.monotonic() < self._retry_at:
+                CIRCUIT_REJECTED.inc(endpoint=self.name)
+                return False
+            self.state = HALF_OPEN
+
+        logger.info(f"Probing {self.name}")
+        try:
+            success = self.probe()
+        except Exception as e:
+            logger.debug(f"Probe of {self.name} failed: {e}")
+            success = False
+
+        if success:
+            self.record_success()
+        else:
+            self.record_failure()
+            CIRCUIT_REJECTED.inc(endpoint=self.name)
+        return success
+
+    def record_success(self):
+        with self._lock:
+            reopened = self.state != CLOSED
+            if reopened:
+                logger.info(f"Circuit to {self.name} closed, endpoint is reachable again")
+            self.state = CLOSED
+            self._failures = 0
+            self._delay = self.base_delay
+        CIRCUIT_OPEN.set(0, endpoint=self.name)
+
+        if reopened:
+            for listener in self._listeners:
+                listener()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            # A request sent before the circuit opened doesn't restart the backoff
+            if self.state == OPEN or (self.state == CLOSED and self._failures < self.failure_threshold):
+                return
+
+            if self.state == HALF_OPEN:
+                self._delay = min(self._delay * 2, self.max_delay)
+            delay = random.uniform(self._delay / 2, self._delay)
+            self._retry_at = time.monotonic() + delay
+            self.state = OPEN
+
+        logger.warning(f"Circuit to {self.name} open after {self._failures} failures, probing again in {delay:.0f} seconds")
+        CIRCUIT_OPEN.set(1, endpoint=self.name)
@@ -1,24 +1,245 @@
-import requests
 import logging
+import threading
+import time
 import xml.etree.ElementTree as ET
+from alpha2_breaker import CircuitBreaker, CircuitOpenError
+from alpha2_metrics import CHANGES_POST_SECONDS
+from alpha2_model import Alpha2Model
+from alpha2_trace import span
+
+# Timeouts in seconds, passed to requests as (connect, read)
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+POOL_SIZE = 10
+
+# Connection attempts that failed before anything reached the server are
+# retried right away this many times. Everything else is left to the
+# CircuitBreaker counting the request, which backs off between failures.
+MAX_RETRIES = 1
+
+# Seconds the IODEVICE inventory from static.xml is reused before it is fetched again
+INVENTORY_TTL = 300
+
+# IODEVICE_TYPE of virtual rooms created with CMD_CREATE_XMLDEVICE
+VIRTUAL_DEVICE_TYPE = 8
+
+# Bytes read from the network per parser feed when streaming XML documents
+CHUNK_SIZE = 8192
+
+# Documents up to this size are parsed in one piece. Streaming them is 1.5 to
+# 2.3 times slower (devel/bench_xml.py: 1.9 vs 1.1 ms for the 28 KiB static.xml
+# of 12 areas), and only pays off for huge ones in memory (0.1 vs 4.7 MiB
+# peak for the 550 KiB static.xml of 255 areas).
+STREAM_THRESHOLD = 256 * 1024
+
+
+def create_session(pool_size=POOL_SIZE, max_retries=MAX_RETRIES, transport='requests'):
+    """Create a keep-alive HTTP session, retrying failed connection attempts up to max_retries times
+
+    The 'stdlib' transport runs on http.client alone and skips loading
+    requests and its dependencies, see alpha2_http.
+    """
+    if transport == 'stdlib':
+        from alpha2_http import HTTPSession
+        return HTTPSession(pool_size=pool_size, max_retries=max_retries)
+
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Nothing reached the server yet, so even commands like
+    # CMD_CREATE_XMLDEVICE that are not idempotent can be retried. Read errors
+    # and 5xx answers are not retried.
+    retry = Retry(total=max_retries, connect=max_retries, read=0, status=0, other=0, redirect=0)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def build_update_xml(device_id, temperatures, field='T_ACTUAL'):
+    """Build a changes.xml document setting T_ACTUAL (or field) for several heating areas"""
+    heatareas = "".join(
+        f"""
+                <HEATAREA nr="{area_id}">
+                    <{field}>{temperature}</{field}>
+                </HEATAREA>"""
+        for area_id, temperature in temperatures.items()
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+        <Devices>
+            <Device>
+                <ID>{device_id}</ID>{heatareas}
+            </Device>
+        </Devices>"""
+
+
+def iter_device_children(events):
+    """Yield every complete direct child of Devices/Device from XMLPullParser events
+
+    Each child is dropped from the tree once the consumer is done with it, so
+    memory stays bounded by the largest single element instead of the whole
+    document.
+    """
+    path = []
+    device_elem = None
+
+    for event, elem in events:
+        if event == 'start':
+            path.append(elem.tag)
+            if path == ['Devices', 'Device']:
+                device_elem = elem
+            continue
+
+        path.pop()
+        if path == ['Devices', 'Device']:
+            yield elem
+            device_elem.remove(elem)
+
+
+def iter_response_events(response):
+    """Yield XMLPullParser events of a response while it arrives"""
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        parser.feed(chunk)
+        yield from parser.read_events()
+
+    parser.close()
+    yield from parser.read_events()
 
 
 class Alpha2Client:
-    def __init__(self, host):
+    def __init__(self, host, session=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), inventory_ttl=INVENTORY_TTL,
+                 device_id=None):
         self.host = host
         self.api_url = f"http://{host}/data/changes.xml"
         self.static_url = f"http://{host}/data/static.xml"
+        self.dynamic_url = f"http://{host}/data/dynamic.xml"
+        self.cyclic_url = f"http://{host}/data/cyclic.xml"
         self.logger = logging.getLogger(__name__)
-        self.device_id = self._get_device_id()
+        self.session = session or create_session()
+        self.timeout = timeout
+        self.inventory_ttl = inventory_ttl
+        self.device_id = device_id
 
-    def _get_device_id(self):
-        
-        content = self._get_static()
+        # Stops requests while the base station is unreachable, shared with AsyncAlpha2Client
+        self.breaker = CircuitBreaker(host, self.probe)
+
+        # Typed state of the base station. Its IODEVICEs are the inventory,
+        # indexed by IODEVICE_TYPE whenever static.xml was read. A time of
+        # None forces a reload, an expired one is revalidated via cyclic.xml.
+        self.model = Alpha2Model()
+        self._inventory_time = None
+        self._devices_by_type = None
+
+        # Threads needing static.xml at the same time share one read
+        self._static_lock = threading.Lock()
+
+        # The device ID is read from the same static.xml as the inventory. A
+        # cached one is used right away and the inventory is loaded on first use.
+        if self.device_id is None:
+            self._load_static(self._inventory_stale)
+
+    def update_model(self, url=None):
+        """Update the model from cyclic.xml (or url), loading it from static.xml first
+
+        Every read also revalidates the inventory, as cyclic.xml and
+        dynamic.xml list all IODEVICEs. Returns the list of Changes, or None
+        if the document couldn't be read.
+        """
+        if not self.model.loaded:
+            return self._load_static(lambda: not self.model.loaded)
+
+        iodevice_nrs = set()
+        try:
+            changes = self.model.apply(
+                self._iter_children(url or self.cyclic_url, lambda elem: iodevice_nrs.add(int(elem.get('nr'))))
+            )
+        except CircuitOpenError as e:
+            self.logger.debug(e)
+            return None
+        except Exception as e:
+            self.logger.error(f"Error communicating with Alpha 2: {e}")
+            return None
+
+        self._revalidate_inventory(iodevice_nrs)
+        return changes
+
+    def _iter_children(self, url, on_iodevice):
+        """Stream the children of Devices/Device, passing every IODEVICE to on_iodevice first"""
+        for elem in self._read_children(url):
+            if elem.tag == 'IODEVICE':
+                on_iodevice(elem)
+            yield elem
+
+    def _load_static(self, needed):
+        """Read static.xml into the model and index its IODEVICEs, unless needed() is False by then
+
+        Returns the list of Changes of the model, or None if static.xml
+        couldn't be read.
+        """
+        with self._static_lock:
+            # Another thread may have read static.xml while this one waited
+            if not needed():
+                return []
+
+            try:
+                changes = self.model.apply(self._read_children(self.static_url), complete=True)
+            except CircuitOpenError as e:
+                self.logger.debug(e)
+                return None
+            except Exception as e:
+                self.logger.error(f"Error communicating with Alpha 2: {e}")
+                return None
+
+            if self.model.device.id is None:
+                # Without a device ID no command can be sent, try again on next use
+                return None
+
+            self.device_id = self.model.device.id
+            self._devices_by_type = self.model.iodevices_by_type()
+            self._inventory_time = time.monotonic()
+            return changes
+
+    def invalidate_inventory(self):
+        """Fetch static.xml again on the next inventory access"""
+        self._inventory_time = None
+
+    def _inventory_stale(self):
+        return self._inventory_time is None or time.monotonic() - self._inventory_time >= self.inventory_ttl
+
+    def _get_inventory(self):
+        """IODEVICEs of the model by IODEVICE_TYPE, None if static.xml was never read"""
+        if self._inventory_time is None:
+            self._load_static(self._inventory_stale)
+        elif self._inventory_stale():
+            # Only download static.xml again if cyclic.xml lists other IODEVICEs
+            self.update_model()
+            if self._inventory_stale():
+                self._load_static(self._inventory_stale)
+        return self._devices_by_type
+
+    def _has_device_id(self):
+        """Check that the device ID is known, reading it if static.xml couldn't be read so far"""
+        if self.device_id is None:
+            self._load_static(self._inventory_stale)
 
-        if content:
-            root = ET.fromstring(content)       
-            device_id = root.find('./Device/ID').text
-            return device_id
+        if self.device_id is None:
+            self.logger.error(f"Device ID of {self.host} is unknown, not sending command")
+            return False
+        return True
+
+    def _revalidate_inventory(self, iodevice_nrs):
+        """Keep the inventory for another inventory_ttl if a read listed the same IODEVICEs"""
+        if self._inventory_time is None:
+            return
+
+        if iodevice_nrs == {iodevice.nr for iodevices in self._devices_by_type.values() for iodevice in iodevices}:
+            self._inventory_time = time.monotonic()
+        else:
+            self.invalidate_inventory()
         
     def create_virtual_device(self, area_id):
         """Create a virtual device in the Alpha 2 system"""
@@ -29,77 +250,112 @@ class Alpha2Client:
             </Device>
         </Devices>"""
         
-        return self._send_command(xml)
-    
-    def update_temperature(self, area_id, temperature):
-        """Update the actual temperature for a heating area"""
+        result = self._send_command(xml)
+        self.invalidate_inventory()
+        return result
+
+    def delete_virtual_device(self, iodevice_id):
+        """Delete a virtual device from the Alpha 2 system"""
         xml = f"""<?xml version="1.0" encoding="UTF-8"?>
         <Devices>
             <Device>
-                <ID>{self.device_id}</ID>
-                <HEATAREA nr="{area_id}">
-                    <T_ACTUAL>{temperature}</T_ACTUAL>
-                </HEATAREA>
+                <COMMAND>CMD_DELETE_XMLDEVICE:{iodevice_id}</COMMAND>
             </Device>
         </Devices>"""
         
+        result = self._send_command(xml)
+        self.invalidate_inventory()
+        return result
+    
+    def update_temperature(self, area_id, temperature):
+        """Update the actual temperature for a heating area"""
+        return self.update_temperatures({area_id: temperature})
+
+    def update_temperatures(self, temperatures):
+        """Update the actual temperature for several heating areas in one request"""
+        if not temperatures:
+            return True
+        if not self._has_device_id():
+            return False
+
+        with span('build_xml', areas=len(temperatures)):
+            xml = build_update_xml(self.device_id, temperatures)
         return self._send_command(xml)
         
     def set_target_temperature(self, area_id, temperature):
         """Set the target temperature for a heating area"""
-        xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-        <Devices>
-            <Device>
-                <ID>{self.device_id}</ID>
-                <HEATAREA nr="{area_id}">
-                    <T_TARGET>{temperature}</T_TARGET>
-                </HEATAREA>
-            </Device>
-        </Devices>"""
-        
+        if not self._has_device_id():
+            return False
+
+        with span('build_xml', areas=1):
+            xml = build_update_xml(self.device_id, {area_id: temperature}, 'T_TARGET')
         return self._send_command(xml)
     
     def get_all_devices(self):
-        content = self._get_static()
+        """Get all IODEVICEs of the model, None if static.xml couldn't be read so far"""
+        devices_by_type = self._get_inventory()
+        if devices_by_type is None:
+            return None
+        return [iodevice for iodevices in devices_by_type.values() for iodevice in iodevices]
 
-        if content:
-            root = ET.fromstring(content)
-            iodevices = []
-            
-            # Find all IODEVICE elements
-            for iodevice_elem in root.findall('./Device/IODEVICE'):
-                # Get the 'nr' attribute
-                device_nr = iodevice_elem.get('nr')
-                
-                # Create dictionary for this IODEVICE
-                iodevice = {'nr': device_nr}
-                
-                # Add all child elements to the dictionary
-                for child in iodevice_elem:
-                    iodevice[child.tag] = child.text
-                
-                iodevices.append(iodevice)
-            
-            return iodevices
+    def get_devices_by_type(self, device_type):
+        """Get the IODEVICEs of an IODEVICE_TYPE"""
+        return (self._get_inventory() or {}).get(device_type, [])
     
-    def _get_static(self):
+    def probe(self):
+        """Check if the base station answers with a single cheap request"""
+        with self.session.get(self.cyclic_url, timeout=self.timeout, stream=True) as response:
+            return response.status_code < 500
+
+    def _read_children(self, url):
+        """Download an XML document and yield the children of Devices/Device
+
+        Documents larger than STREAM_THRESHOLD, or of unknown length, are
+        parsed while they arrive, see iter_device_children().
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit to {self.host} is open, not requesting {url}")
+
+        headers = {'Content-Type': 'application/xml'}
         try:
-            headers = {'Content-Type': 'application/xml'}
-            response = requests.get(self.static_url, headers=headers)
-            
-            if response.status_code == 200:
-                return response.content
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        with response:
+            if response.status_code >= 500:
+                self.breaker.record_failure()
             else:
-                self.logger.error(f"Failed get static.xml: {response.status_code}, {response.text}")
-                return None
-        except Exception as e:
-            self.logger.error(f"Error communicating with Alpha 2: {e}")
-            return None
+                self.breaker.record_success()
+
+            if response.status_code != 200:
+                raise ConnectionError(f"Failed get {url}: {response.status_code}, {response.text}")
+
+            length = int(response.headers.get('Content-Length') or 0)
+            if 0 < length <= STREAM_THRESHOLD:
+                root = ET.fromstring(response.content)
+                if root.tag == 'Devices':
+                    for device in root.iterfind('Device'):
+                        yield from device
+                return
+
+            yield from iter_device_children(iter_response_events(response))
 
     def _send_command(self, xml_data):
+        if not self.breaker.allow():
+            self.logger.debug(f"Circuit to {self.host} is open, not sending command")
+            return False
+
         try:
             headers = {'Content-Type': 'application/xml'}
-            response = requests.post(self.api_url, data=xml_data, headers=headers)
+            with CHANGES_POST_SECONDS.time(), span('alpha2_post', host=self.host):
+                response = self.session.post(self.api_url, data=xml_data, headers=headers, timeout=self.timeout)
+
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
             
             if response.status_code == 200:
                 self.logger.info("Command sent successfully")
@@ -108,5 +364,6 @@ class Alpha2Client:
                 self.logger.error(f"Failed to send command: {response.status_code}, {response.text}")
                 return False
         except Exception as e:
+            self.breaker.record_failure()
             self.logger.error(f"Error communicating with Alpha 2: {e}")
             return False
\ No newline at end of file
@@ -0,0 +1,356 @@
+import logging
+import threading
+import time
+from alpha2_client import Alpha2Client, VIRTUAL_DEVICE_TYPE
+from alpha2_metrics import AREA_UPDATES, AREA_LAST_UPDATE, SEND_SECONDS, TARGET_UPDATES
+from alpha2_trace import trace, span, TRACE_THRESHOLD
+
+logger = logging.getLogger('alpha2-integration')
+
+# Seconds between attempts to read the inventory of an unreachable base station
+REVALIDATE_RETRY = 30
+
+
+class ControllerWorker:
+    """Sends temperatures to one Alpha 2 base station independently of the others
+
+    Readings are merged into a pending buffer by submit() and sent by the
+    worker's own thread (or asyncio task, see alpha2_async_engine), so a slow or offline base station
+    only delays itself. If a send takes longer than a cycle, newer readings
+    of an area replace older ones instead of queueing up.
+
+    Target temperatures set in Home Assistant are sent the same way, and an
+    optional Alpha2Mirror is synced by the worker every mirror_interval.
+
+    With a StateStore the device ID, the virtual devices and the last values
+    sent are cached. After a restart with a virtual device cached for every
+    area, sending starts right away without reading static.xml and the cache
+    is checked against the base station in the background.
+    """
+
+    def __init__(self, name, host, devices, session, timeout, deadband=0.0, max_update_age=600,
+                 mirror=None, mirror_interval=60, store=None, trace_threshold=TRACE_THRESHOLD):
+        self.name = name
+        self.host = host
+        self.devices = devices
+        self.session = session
+        self.timeout = timeout
+        self.deadband = deadband
+        self.max_update_age = max_update_age
+        self.mirror = mirror
+        self.mirror_interval = mirror_interval
+        self.store = store
+        self.trace_threshold = trace_threshold
+        self.client = None
+        self.ready = threading.Event()
+        self._stopped = threading.Event()
+
+        # Last temperature sent per area as (temperature, monotonic timestamp)
+        self.last_sent = {}
+
+        # IODEVICE_ID of the virtual device per HEATAREA_NR, as read from static.xml
+        self.virtual_devices = {}
+        self.cached_device_id = None
+        self.restore()
+
+        # Last target temperature read from Home Assistant per area
+        self.targets_seen = {}
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_targets = {}
+        self._sending = False
+        self._event = threading.Event()
+        self._loop = None
+        self._async_event = None
+
+    @property
+    def idle(self):
+        """True if no readings are waiting or being sent"""
+        with self._lock:
+            return not self._pending and not self._pending_targets and not self._sending
+
+    def submit(self, temperatures):
+        """Queue temperatures for this base station without waiting for the send"""
+        if not temperatures:
+            return
+
+        with self._lock:
+            self._pending.update(temperatures)
+
+        self._wakeup()
+
+    def submit_targets(self, targets):
+        """Queue the target temperatures that changed in Home Assistant"""
+        with self._lock:
+            for area_id, target in targets.items():
+                last_target = self.targets_seen.get(area_id)
+                self.targets_seen[area_id] = target
+
+                # The first reading is only a baseline, so a restart doesn't override the base station
+                if last_target is not None and target != last_target:
+                    self._pending_targets[area_id] = target
+
+            if not self._pending_targets:
+                return
+
+        self._wakeup()
+
+    def _wakeup(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_event.set)
+        else:
+            self._event.set()
+
+    def use_event_loop(self, loop, event):
+        """Wake up an asyncio task with event instead of the worker's thread, see alpha2_async_engine"""
+        with self._lock:
+            self._loop = loop
+            self._async_event = event
+            if self._pending or self._pending_targets:
+                event.set()
+
+    def take_pending(self):
+        """Take the readings and targets to send, the worker is busy until done_sending()"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            targets, self._pending_targets = self._pending_targets, {}
+            self._sending = bool(pending or targets)
+        return pending, targets
+
+    def mirror_timeout(self, next_mirror):
+        if self.mirror is None:
+            return None
+        return max(0, next_mirror - time.monotonic())
+
+    def done_sending(self):
+        with self._lock:
+            self._sending = False
+
+    def restore(self):
+        """Load the cached state of this controller"""
+        cached = self.store.get(self.name) if self.store else None
+        if not cached or cached.get('host') != self.host:
+            return
+
+        # Timestamps are stored as wall clock time, which survives the restart
+        offset = time.monotonic() - time.time()
+        self.cached_device_id = cached.get('device_id')
+        # JSON has string keys only
+        self.virtual_devices = {
+            int(area_id): iodevice_id for area_id, iodevice_id in cached.get('virtual_devices', {}).items()
+        }
+        self.last_sent = {
+            int(area_id): (temperature, sent + offset)
+            for area_id, (temperature, sent) in cached.get('last_sent', {}).items()
+        }
+        logger.info(f"Restored cached state of controller {self.name} (device ID {self.cached_device_id})")
+
+    def persist(self):
+        """Hand the current state of this controller to the store"""
+        if self.store is None:
+            return
+
+        offset = time.time() - time.monotonic()
+        with self._lock:
+            last_sent = {area_id: (temperature, sent + offset) for area_id, (temperature, sent) in self.last_sent.items()}
+            virtual_devices = {str(area_id): iodevice_id for area_id, iodevice_id in self.virtual_devices.items()}
+
+        self.store.update(self.name, {
+            'host': self.host,
+            'device_id': self.client.device_id if self.client else self.cached_device_id,
+            'virtual_devices': virtual_devices,
+            'last_sent': last_sent,
+        })
+
+    def setup(self):
+        """Connect to the base station, from the cached state if there is one"""
+        # Without a cached device ID the client reads it from static.xml right away
+        self.client = Alpha2Client(
+            self.host, session=self.session, timeout=self.timeout, device_id=self.cached_device_id
+        )
+        if self.mirror is not None:
+            self.mirror.attach(self.client.model)
+
+        if self.cached_device_id is not None and not self.uncached_areas():
+            # Start sending with the cached IDs and check them in the background
+            threading.Thread(target=self.revalidate, name=f"revalidate-{self.name}", daemon=True).start()
+        else:
+            self.revalidate()
+            if self._stopped.is_set():
+                return
+        self.ready.set()
+
+    def uncached_areas(self):
+        """Configured areas without a cached virtual device"""
+        with self._lock:
+            return [device['area_id'] for device in self.devices if device['area_id'] not in self.virtual_devices]
+
+    def revalidate(self):
+        """Check the cached state against the base station and create missing virtual devices"""
+        with self._lock:
+            cached = dict(self.virtual_devices)
+
+        while not self.setup_virtual_devices():
+            logger.warning(f"Could not read the inventory of controller {self.name}, retrying in {REVALIDATE_RETRY} seconds")
+            if self._stopped.wait(REVALIDATE_RETRY):
+                return
+
+        if self.cached_device_id is not None and self.cached_device_id != self.client.device_id:
+            logger.warning(f"Device ID of controller {self.name} changed from {self.cached_device_id} to {self.client.device_id}")
+        for area_id, iodevice_id in cached.items():
+            if self.virtual_devices.get(area_id) != iodevice_id:
+                logger.warning(f"Cached virtual device {iodevice_id} of area {area_id} of controller {self.name} is gone")
+
+        self.persist()
+        if self.store is not None:
+            self.store.flush()
+
+    def read_virtual_devices(self):
+        """Read the virtual devices from the inventory, None if it couldn't be read"""
+        if self.client.get_all_devices() is None:
+            return None
+
+        return {
+            iodevice.heatarea_nr: iodevice.id
+            for iodevice in self.client.get_devices_by_type(VIRTUAL_DEVICE_TYPE)
+        }
+
+    def setup_virtual_devices(self):
+        """Create virtual devices in Alpha 2, returns False if the inventory couldn't be read"""
+        # Read the inventory once instead of once per configured device. Without
+        # it every device would look missing and be created a second time.
+        virtual_devices = self.read_virtual_devices()
+        if virtual_devices is None:
+            return False
+        virt_rooms = set(virtual_devices)
+
+        for device in self.devices:
+            # Create virtual device in Alpha 2
+            logger.info(f"Creating virtual device: {device['name']} (AREA: {device['area_id']}, CONTROLLER: {self.name})")
+            if device['area_id'] in virt_rooms:
+                logger.info(f"Skipping device for area {device['area_id']}, device already present")
+                continue
+
+            result = self.client.create_virtual_device(device['area_id'])
+            if not result:
+                logger.error(f"Failed to create device {device['name']} in Alpha 2")
+                continue
+
+            virt_rooms.add(device['area_id'])
+            logger.info(f"Created virtual device {device['name']} in Alpha 2")
+
+        # Creating devices invalidated the inventory, read their IODEVICE_IDs
+        if len(virt_rooms) != len(virtual_devices):
+            virtual_devices = self.read_virtual_devices() or virtual_devices
+
+        with self._lock:
+            self.virtual_devices = virtual_devices
+        return True
+
+    def start(self):
+        """Run the worker in its own thread"""
+        threading.Thread(target=self.run, name=f"controller-{self.name}", daemon=True).start()
+
+    def stop(self):
+        """Stop the worker's thread and the revalidation, also while it waits to retry"""
+        self._stopped.set()
+        self._event.set()
+
+    def run(self):
+        self.setup()
+
+        next_mirror = time.monotonic()
+        while not self._stopped.is_set():
+            if self._event.wait(self.mirror_timeout(next_mirror)):
+                self._event.clear()
+                try:
+                    temperatures, targets = self.take_pending()
+                    with SEND_SECONDS.time(controller=self.name), trace('send', self.trace_threshold, controller=self.name):
+                        self.push_temperatures(temperatures)
+                        self.push_targets(targets)
+                    if targets:
+                        # Publish the new targets without waiting for the next mirror interval
+                        next_mirror = time.monotonic()
+                except Exception as e:
+                    logger.error(f"Error sending temperatures to controller {self.name}: {e}")
+                finally:
+                    self.done_sending()
+
+            if self.mirror is not None and time.monotonic() >= next_mirror:
+                next_mirror = time.monotonic() + self.mirror_interval
+                try:
+                    with trace('mirror', self.trace_threshold, controller=self.name):
+                        self.mirror.sync(self.client)
+                except Exception as e:
+                    logger.error(f"Error mirroring controller {self.name}: {e}")
+
+    def push_temperatures(self, temperatures):
+        """Update Alpha 2 with the temperatures that changed since they were last sent"""
+        changed, now = self.select_changed(temperatures)
+        if changed:
+            self.record_sent(changed, now, self.client.update_temperatures(changed))
+
+    def push_targets(self, targets):
+        """Set the target temperatures changed in Home Assistant"""
+        for area_id, target in self.select_targets(targets).items():
+            with span('set_target', area=area_id):
+                self.record_target(area_id, self.client.set_target_temperature(area_id, target))
+
+    def select_targets(self, targets):
+        """Select the target temperatures that differ from the ones of the base station"""
+        changed = {}
+        for area_id, target in targets.items():
+            if self.mirror is not None and self.mirror.target_temperature(area_id) == target:
+                TARGET_UPDATES.inc(controller=self.name, area=area_id, result='skipped')
+                continue
+
+            logger.info(f"Setting target temperature of area {area_id} of controller {self.name} to {target}")
+            changed[area_id] = target
+        return changed
+
+    def record_target(self, area_id, success):
+        TARGET_UPDATES.inc(controller=self.name, area=area_id, result='sent' if success else 'error')
+
+    def select_changed(self, temperatures):
+        """Select the temperatures that need to be sent to Alpha 2"""
+        now = time.monotonic()
+        changed = {}
+        for area_id, temperature in temperatures.items():
+            if self.needs_update(area_id, temperature, now):
+                changed[area_id] = temperature
+            else:
+                AREA_UPDATES.inc(controller=self.name, area=area_id, result='skipped')
+
+        skipped = len(temperatures) - len(changed)
+        if skipped:
+            logger.debug(f"Skipping {skipped} unchanged temperatures")
+
+        for area_id, temperature in changed.items():
+            logger.info(f"Updating area {area_id} of controller {self.name} with temperature {temperature}")
+
+        return changed, now
+
+    def record_sent(self, temperatures, now, success):
+        """Remember the temperatures successfully sent to Alpha 2"""
+        for area_id, temperature in temperatures.items():
+            if success:
+                with self._lock:
+                    self.last_sent[area_id] = (temperature, now)
+                AREA_UPDATES.inc(controller=self.name, area=area_id, result='sent')
+                AREA_LAST_UPDATE.set(time.time(), controller=self.name, area=area_id)
+            else:
+                AREA_UPDATES.inc(controller=self.name, area=area_id, result='error')
+
+        if success:
+            self.persist()
+
+    def needs_update(self, area_id, temperature, now):
+        """Check if a reading is outside the deadband or the last update is too old"""
+        if area_id not in self.last_sent:
+            return True
+
+        last_temperature, last_time = self.last_sent[area_id]
+        if now - last_time >= self.max_update_age:
+            return True
+        return abs(temperature - last_temperature) > self.deadband
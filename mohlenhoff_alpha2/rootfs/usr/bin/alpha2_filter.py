@@ -0,0 +1,104 @@
+import math
+from array import array
+
+# Readings a moving average or median is calculated over by default
+DEFAULT_WINDOW = 5
+
+# Weight of a new reading in the exponential moving average by default
+DEFAULT_ALPHA = 0.3
+
+# Combine the readings of several sensors of one heating area
+AGGREGATES = {
+    'mean': lambda values: math.fsum(values) / len(values),
+    'min': min,
+    'max': max,
+}
+
+
+class RingBuffer:
+    """Keeps the last size readings in a preallocated array of doubles"""
+
+    def __init__(self, size):
+        self.size = size
+        self._values = array('d', bytes(8 * size))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def values(self):
+        """The stored readings, not in the order they were added"""
+        return self._values[:self._count]
+
+    def clear(self):
+        self._next = 0
+        self._count = 0
+
+
+class MovingAverage:
+    """Mean of the last window readings"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.buffer = RingBuffer(window)
+
+    def add(self, value):
+        self.buffer.append(value)
+        return math.fsum(self.buffer.values()) / len(self.buffer)
+
+    def reset(self):
+        self.buffer.clear()
+
+
+class MovingMedian:
+    """Median of the last window readings, ignores single outliers entirely"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.buffer = RingBuffer(window)
+
+    def add(self, value):
+        self.buffer.append(value)
+        values = sorted(self.buffer.values())
+        middle = len(values) // 2
+        if len(values) % 2:
+            return values[middle]
+        return (values[middle - 1] + values[middle]) / 2
+
+    def reset(self):
+        self.buffer.clear()
+
+
+class ExponentialAverage:
+    """Exponential moving average, each reading moves the result by alpha of the difference"""
+
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.value = None
+
+    def add(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+def create_filter(kind, window=DEFAULT_WINDOW, alpha=DEFAULT_ALPHA):
+    """Create the filter configured for a virtual device, None if readings are sent unfiltered"""
+    if kind in (None, 'none'):
+        return None
+    if kind == 'average':
+        return MovingAverage(window)
+    if kind == 'median':
+        return MovingMedian(window)
+    if kind == 'ema':
+        return ExponentialAverage(alpha)
+    raise ValueError(f"Unknown filter {kind}")
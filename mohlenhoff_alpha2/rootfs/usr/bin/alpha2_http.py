@@ -0,0 +1,172 @@
+import json
+import select
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+
+
+def _connection_dropped(connection):
+    """Check if the server closed an idle keep-alive connection"""
+    # An idle connection has nothing to read unless it was closed by the server
+    return connection.sock is None or bool(select.select([connection.sock], [], [], 0)[0])
+
+
+class HTTPResponse:
+    """The part of requests.Response used by the add-on, on top of http.client"""
+
+    def __init__(self, session, key, connection, response):
+        self.status_code = response.status
+        self.headers = response.headers
+        self._session = session
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self._content = None
+
+    def iter_content(self, chunk_size=8192):
+        if self._content is not None:
+            yield self._content
+            return
+
+        try:
+            while True:
+                chunk = self._response.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self._release()
+
+    @property
+    def content(self):
+        if self._content is None:
+            try:
+                self._content = self._response.read()
+            finally:
+                self._release()
+        return self._content
+
+    @property
+    def text(self):
+        charset = self.headers.get_content_charset() or 'utf-8'
+        return self.content.decode(charset, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _release(self):
+        """Return the connection to the pool once the body was read completely"""
+        if self._connection is None:
+            return
+
+        if self._response.isclosed() and not self._response.will_close:
+            self._session._put_connection(self._key, self._connection)
+        else:
+            # An unread body would be mistaken for the next response
+            self._connection.close()
+        self._connection = None
+
+
+class HTTPSession:
+    """Keep-alive HTTP client on the standard library with the retry policy of create_session()
+
+    Failed connection attempts are retried right away, errors after the
+    request was sent are raised. Responses support the subset of the
+    requests API used by the add-on, so this can replace a requests.Session
+    where loading requests costs too much startup time and memory.
+    """
+
+    def __init__(self, pool_size=10, max_retries=1):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._idle = {}
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, headers=None, data=None, json=None, timeout=None, stream=False):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+        headers = dict(headers or {})
+        body = data
+        if json is not None:
+            body = _dumps(json)
+            headers['Content-Type'] = 'application/json'
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        retries = 0
+        while True:
+            try:
+                connection = self._get_connection(key, connect_timeout)
+                break
+            except OSError:
+                # Nothing reached the server, so every method can be retried
+                if retries >= self.max_retries:
+                    raise
+                retries += 1
+
+        try:
+            connection.sock.settimeout(read_timeout)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+
+        wrapped = HTTPResponse(self, key, connection, response)
+        if not stream:
+            wrapped.content
+        return wrapped
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _get_connection(self, key, connect_timeout):
+        with self._lock:
+            connections = self._idle.get(key, [])
+            while connections:
+                connection = connections.pop()
+                if not _connection_dropped(connection):
+                    return connection
+                connection.close()
+
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(host, port, timeout=connect_timeout)
+        connection.connect()
+        return connection
+
+    def _put_connection(self, key, connection):
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.pool_size:
+                connections.append(connection)
+                return
+        connection.close()
+
+
+def _dumps(value):
+    # The json module is shadowed by the parameter of HTTPSession.request()
+    return json.dumps(value).encode('utf-8')
@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
 import time
+import signal
 import logging
-import requests
-from alpha2_client import Alpha2Client
+from alpha2_breaker import CircuitBreaker
+from alpha2_client import create_session, CONNECT_TIMEOUT, READ_TIMEOUT
+from alpha2_controller import ControllerWorker
+from alpha2_filter import create_filter, AGGREGATES, DEFAULT_WINDOW, DEFAULT_ALPHA
+from alpha2_mirror import Alpha2Mirror
+from alpha2_profiler import SamplingProfiler, PROFILE_DIR, PROFILE_SECONDS
+from alpha2_state import StateStore, STATE_PATH
+from alpha2_trace import trace, span, TRACE_THRESHOLD
+from alpha2_metrics import (
+    start_metrics_server, METRICS_PORT, HA_FETCH_SECONDS, AREA_UPDATES, CYCLE_SECONDS, CYCLE_OVERRUNS,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -13,14 +24,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger('alpha2-integration')
 
+# Name of the controller configured by alpha2_host
+DEFAULT_CONTROLLER = 'default'
+
 class Alpha2Integration:
     def __init__(self):
         # Load configuration from environment or file
         self.load_config()
         
-        # Initialize Alpha 2 client
-        self.alpha2 = Alpha2Client(self.config['alpha2_host'])
-        
+        # Pooled keep-alive transport shared by the Alpha 2 clients and the HA calls
+        self.session = create_session(transport=self.config.get('transport', 'requests'))
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
         # Home Assistant API settings
         self.ha_url = os.environ.get('SUPERVISOR_URL', 'http://supervisor/core')
         self.ha_token = os.environ.get('SUPERVISOR_TOKEN', '')
@@ -28,6 +43,56 @@ class Alpha2Integration:
             'Authorization': f'Bearer {self.ha_token}',
             'Content-Type': 'application/json',
         }
+        self.ha_ws_url = os.environ.get('SUPERVISOR_WS_URL', self.ha_url.replace('http', 'ws', 1) + '/websocket')
+        self.ha_breaker = CircuitBreaker('home_assistant', self.probe_ha)
+
+        # Cached controller state, only kept where the add-on has its /data volume
+        state_path = os.environ.get('STATE_PATH', STATE_PATH)
+        self.store = StateStore(state_path) if os.path.isdir(os.path.dirname(state_path)) else None
+
+        # Slow cycles are logged with their spans and optionally profiled
+        self.trace_threshold = self.config.get('trace_threshold', TRACE_THRESHOLD)
+        self.profile_seconds = self.config.get('profile_seconds', 0)
+        self.profiler = SamplingProfiler(
+            os.environ.get('PROFILE_DIR', PROFILE_DIR), self.profile_seconds or PROFILE_SECONDS
+        )
+
+        # One worker per Alpha 2 base station
+        self.workers = self.create_workers()
+        self.mirrors = [worker.mirror for worker in self.workers.values() if worker.mirror is not None]
+        self.ha_breaker.subscribe(self.republish)
+
+        # Sensors shared between controllers are still fetched only once per cycle
+        self.devices_by_entity = {}
+        self.targets_by_entity = {}
+        self.devices_by_area = {}
+        # One filter per sensor of an area, devices sharing an area are combined after filtering
+        self.filters = {}
+        for worker in self.workers.values():
+            for device in worker.devices:
+                area = (device['controller'], device['area_id'])
+                self.devices_by_area.setdefault(area, []).append(device)
+                for entity_id in device['entity_ids']:
+                    self.devices_by_entity.setdefault(entity_id, []).append(device)
+                    self.filters.setdefault((*area, entity_id), create_filter(
+                        device.get('filter'),
+                        device.get('filter_window', DEFAULT_WINDOW),
+                        device.get('filter_alpha', DEFAULT_ALPHA),
+                    ))
+                if device.get('target_entity_id'):
+                    self.targets_by_entity.setdefault(device['target_entity_id'], []).append(device)
+        self.entity_ids = list(dict.fromkeys([*self.devices_by_entity, *self.targets_by_entity]))
+
+        # Latest filtered temperature per controller, area and sensor, combined
+        # per area by aggregate_temperatures()
+        self.readings = {}
+
+        # Latest combined temperature per controller and heating area. Every
+        # controller has its dict up front, so the WebSocket thread only
+        # changes the inner ones while a cycle resends them.
+        self.temperatures = {name: {} for name in self.workers}
+
+        self.ws_listener = None
     
     def load_config(self):
         """Load configuration from options.json or environment"""
@@ -41,94 +106,361 @@ class Alpha2Integration:
             # Fall back to environment variables for testing
             self.config = {
                 'alpha2_host': os.environ.get('ALPHA2_HOST', 'localhost:5000'),
+                'controllers': json.loads(os.environ.get('CONTROLLERS', '[]')),
                 'update_interval': int(os.environ.get('UPDATE_INTERVAL', '60')),
-                'virtual_devices': json.loads(os.environ.get('VIRTUAL_DEVICES', '[]'))
+                'virtual_devices': json.loads(os.environ.get('VIRTUAL_DEVICES', '[]')),
+                'use_websocket': os.environ.get('USE_WEBSOCKET', '').lower() in ('true', '1', 'yes'),
+                'deadband': float(os.environ.get('DEADBAND', '0.0')),
+                'max_update_age': int(os.environ.get('MAX_UPDATE_AGE', '600')),
+                'engine': os.environ.get('ENGINE', 'sync'),
+                'max_parallel_requests': int(os.environ.get('MAX_PARALLEL_REQUESTS', '4')),
+                'metrics': os.environ.get('METRICS', '').lower() in ('true', '1', 'yes'),
+                'mirror': os.environ.get('MIRROR', '').lower() in ('true', '1', 'yes'),
+                'transport': os.environ.get('TRANSPORT', 'requests'),
+                'trace_threshold': float(os.environ.get('TRACE_THRESHOLD', str(TRACE_THRESHOLD))),
+                'profile_seconds': int(os.environ.get('PROFILE_SECONDS', '0')),
             }
             logger.info("Loaded configuration from environment variables")
+
+    def create_workers(self):
+        """Create a worker per controller and assign the virtual devices to them"""
+        controllers = list(self.config.get('controllers', []))
+        if self.config.get('alpha2_host'):
+            controllers.insert(0, {'name': DEFAULT_CONTROLLER, 'host': self.config['alpha2_host']})
+        if not controllers:
+            raise ValueError("Neither alpha2_host nor controllers are configured")
+
+        workers = {}
+        for controller in controllers:
+            if controller['name'] in workers:
+                logger.error(f"Ignoring duplicate controller {controller['name']}")
+                continue
+
+            workers[controller['name']] = ControllerWorker(
+                controller['name'],
+                controller['host'],
+                [],
+                self.session,
+                self.timeout,
+                deadband=self.config.get('deadband', 0.0),
+                max_update_age=self.config.get('max_update_age', 600),
+                mirror=self.create_mirror(controller['name']),
+                mirror_interval=self.config['update_interval'],
+                store=self.store,
+                trace_threshold=self.trace_threshold,
+            )
+
+        # Devices without a controller belong to the first one
+        for device in self.config['virtual_devices']:
+            name = device.get('controller') or controllers[0]['name']
+            if name not in workers:
+                logger.error(f"Ignoring device {device['name']}, controller {name} is not configured")
+                continue
+
+            # All sensors of the room, combined into one temperature per reading
+            entity_ids = [device['temperature_entity_id'], *device.get('temperature_entity_ids', [])]
+            workers[name].devices.append(dict(device, controller=name, entity_ids=list(dict.fromkeys(entity_ids))))
+
+        return workers
+
+    def create_mirror(self, controller):
+        """Create the mirror of a controller's heating areas if it is enabled"""
+        if not self.config.get('mirror', False):
+            return None
+        return Alpha2Mirror(controller, self.session, self.ha_url, self.ha_headers, self.timeout, self.ha_breaker)
     
     def start(self):
         """Start the integration"""
-        # Setup virtual devices
-        self.setup_virtual_devices()
+        if self.config.get('metrics', False):
+            start_metrics_server(int(os.environ.get('METRICS_PORT', METRICS_PORT)))
+
+        if self.config.get('use_websocket', False):
+            self.start_websocket()
+
+        if self.store is not None:
+            self.store.start()
+
+        # s6 stops the service with SIGTERM, exit cleanly so the state is written
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        # Profile the running add-on on demand, see Slow Cycles in the README
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.profiler.start())
         
         try:
             # Start monitoring temperatures
-            self.monitor_temperatures()
+            if self.config.get('engine', 'sync') == 'async':
+                # asyncio and aiohttp take long to import, the sync engine never loads them
+                import alpha2_async_engine
+                alpha2_async_engine.run(self)
+            else:
+                # Each worker sets up its virtual devices in its own thread
+                for worker in self.workers.values():
+                    worker.start()
+                self.monitor_temperatures()
         except KeyboardInterrupt:
             logger.info("Stopping integration...")
-    
-    def setup_virtual_devices(self):
-        """Create virtual devices in Alpha 2"""
-        for device in self.config['virtual_devices']:
-            # Create virtual device in Alpha 2
-            logger.info(f"Creating virtual device: {device['name']} (AREA: {device['area_id']})")
-            devices = self.alpha2.get_all_devices()
-            virt_rooms = [elem["HEATAREA_NR"] for elem in devices if elem["IODEVICE_TYPE"] == "8"]
-            if str(device['area_id']) in virt_rooms:
-                logger.info(f"Skipping device for area {device['area_id']}, device already present")
-                continue
-
-            result = self.alpha2.create_virtual_device(device['area_id'])
-            if not result:
-                logger.error(f"Failed to create device {device['name']} in Alpha 2")
-                continue
-            
-            logger.info(f"Created virtual device {device['name']} in Alpha 2")
+        finally:
+            for worker in self.workers.values():
+                worker.stop()
+            if self.store is not None:
+                self.store.flush()
     
     def monitor_temperatures(self):
         """Monitor temperature sensors from Home Assistant and update Alpha 2"""
         logger.info(f"Starting temperature monitoring with interval {self.config['update_interval']} seconds")
         
         while True:
-            try:
-                for device in self.config['virtual_devices']:
-                    # Get current temperature from sensor via Home Assistant API
-                    entity_id = device['temperature_entity_id']
-                    logger.debug(f"Fetching temperature from {entity_id}")
-                    
-                    try:
-                        response = requests.get(
-                            f"{self.ha_url}/api/states/{entity_id}",
-                            headers=self.ha_headers,
-                            timeout=10
-                        )
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            
-                            # Handle different sensor formats
-                            if data['state'] == 'unavailable' or data['state'] == 'unknown':
-                                logger.warning(f"Sensor {entity_id} is {data['state']}")
-                                continue
-                                
-                            try:
-                                # Try to get temperature directly from state
-                                current_temp = float(data['state'])
-                            except ValueError:
-                                # If state isn't a number, try to get it from attributes
-                                if 'attributes' in data and 'temperature' in data['attributes']:
-                                    current_temp = float(data['attributes']['temperature'])
-                                else:
-                                    logger.error(f"Could not extract temperature from {entity_id}")
-                                    continue
-                            
-                            area_id = device['area_id']
-                            
-                            # Update Alpha 2 with current temperature
-                            logger.info(f"Updating {device['name']} with temperature {current_temp}")
-                            self.alpha2.update_temperature(area_id, current_temp)
-                            
-                        else:
-                            logger.error(f"Failed to get temperature for {entity_id}: {response.status_code}")
-                    except Exception as e:
-                        logger.error(f"Error getting temperature for {entity_id}: {e}")
-            
-            except Exception as e:
-                logger.error(f"Error in temperature monitoring loop: {e}")
+            self.run_cycle()
                 
             # Wait before next check
             time.sleep(self.config['update_interval'])
 
+    def run_cycle(self):
+        """Run one cycle of the monitor loop"""
+        with trace('cycle', self.trace_threshold) as cycle:
+            try:
+                if self.ws_listener and self.ws_listener.connected:
+                    logger.debug("Receiving state changes via WebSocket, skipping REST poll")
+                    self.resend_temperatures()
+                else:
+                    self.dispatch_states(self.poll_states())
+
+            except Exception as e:
+                logger.error(f"Error in temperature monitoring loop: {e}")
+
+        self.record_cycle(cycle.duration)
+
+    def record_cycle(self, duration):
+        """Record the duration of a monitor loop cycle"""
+        CYCLE_SECONDS.observe(duration)
+        if duration > self.config['update_interval']:
+            CYCLE_OVERRUNS.inc()
+            logger.warning(f"Cycle took {duration:.1f} seconds, longer than the update interval")
+
+        # Slow cycles tend to repeat, so the following ones are sampled
+        if self.profile_seconds and self.trace_threshold and duration > self.trace_threshold:
+            self.profiler.start(automatic=True)
+
+    def poll_states(self):
+        """Fetch the current state of every configured entity via the REST API"""
+        if not self.ha_breaker.allow():
+            logger.debug("Circuit to Home Assistant is open, skipping REST poll")
+            return None
+
+        # Collect all readings of this cycle so they can be sent in one request
+        try:
+            return self.fetch_states()
+        except Exception as e:
+            self.ha_breaker.record_failure()
+            logger.error(f"Error getting states from Home Assistant: {e}")
+            return None
+
+    def probe_ha(self):
+        """Check if the Home Assistant API answers with a single cheap request"""
+        response = self.session.get(f"{self.ha_url}/api/", headers=self.ha_headers, timeout=self.timeout)
+        return response.status_code < 500
+
+    def read_temperatures(self, states):
+        """Map the fetched sensor states to temperatures per controller and heating area"""
+        for entity_id in self.devices_by_entity:
+            if entity_id not in states:
+                logger.error(f"No state available for {entity_id}")
+                self.update_reading(entity_id, None)
+            else:
+                # A failed fetch of this entity (None) was already logged
+                self.update_reading(entity_id, states[entity_id])
+
+        return self.aggregate_temperatures(self.devices_by_area)
+
+    def update_reading(self, entity_id, data):
+        """Add the temperature of a sensor to its filters, or forget it while the sensor has none"""
+        current_temp = None if data is None else self.extract_temperature(entity_id, data)
+        # A sensor listed twice for an area is still one reading of its filter
+        for key in dict.fromkeys((device['controller'], device['area_id'], entity_id)
+                                 for device in self.devices_by_entity[entity_id]):
+            sensor_filter = self.filters[key]
+            if current_temp is None:
+                # Old readings would distort the first ones after the sensor returns
+                if sensor_filter is not None:
+                    sensor_filter.reset()
+                self.readings.pop(key, None)
+            else:
+                self.readings[key] = current_temp if sensor_filter is None else sensor_filter.add(current_temp)
+
+    def aggregate_temperatures(self, areas):
+        """Combine the filtered readings of the sensors of each heating area"""
+        temperatures = {}
+
+        for controller, area_id in areas:
+            devices = self.devices_by_area[(controller, area_id)]
+            entity_ids = dict.fromkeys(entity_id for device in devices for entity_id in device['entity_ids'])
+            readings = (self.readings.get((controller, area_id, entity_id)) for entity_id in entity_ids)
+            values = [value for value in readings if value is not None]
+            if not values:
+                self.temperatures[controller].pop(area_id, None)
+                AREA_UPDATES.inc(controller=controller, area=area_id, result='error')
+                continue
+
+            with span('aggregate', controller=controller, area=area_id):
+                current_temp = AGGREGATES[devices[0].get('aggregate', 'mean')](values)
+                # Means carry more digits than a sensor or the base station resolves
+                current_temp = round(current_temp, 2)
+
+            logger.debug(f"Read temperature {current_temp} for {', '.join(device['name'] for device in devices)}")
+            temperatures.setdefault(controller, {})[area_id] = current_temp
+            self.temperatures[controller][area_id] = current_temp
+
+        return temperatures
+
+    def read_targets(self, states):
+        """Map the fetched target entity states to target temperatures per controller and heating area"""
+        targets = {}
+
+        for entity_id, devices in self.targets_by_entity.items():
+            # Target entities are optional inputs, a missing one is not an error
+            if states.get(entity_id) is None:
+                continue
+
+            target = self.extract_temperature(entity_id, states[entity_id])
+            if target is None:
+                continue
+
+            for device in devices:
+                targets.setdefault(device['controller'], {})[device['area_id']] = target
+
+        return targets
+
+    def fetch_states(self):
+        """Fetch the states of all configured entities in a single request"""
+        logger.debug(f"Fetching states of {len(self.entity_ids)} entities")
+        with HA_FETCH_SECONDS.time(), span('ha_fetch'):
+            response = self.session.get(
+                f"{self.ha_url}/api/states",
+                headers=self.ha_headers,
+                timeout=self.timeout
+            )
+
+        if response.status_code >= 500:
+            self.ha_breaker.record_failure()
+        else:
+            self.ha_breaker.record_success()
+
+        if response.status_code != 200:
+            logger.error(f"Failed to get states from Home Assistant: {response.status_code}")
+            return {}
+
+        with span('json_decode'):
+            return self.select_states(response.json())
+
+    def select_states(self, states):
+        """Key the states of the configured entities by entity ID, dropping all others"""
+        return {
+            state['entity_id']: state
+            for state in states
+            if state['entity_id'] in self.devices_by_entity or state['entity_id'] in self.targets_by_entity
+        }
+
+    def extract_temperature(self, entity_id, data):
+        """Extract the temperature from a Home Assistant state object, None if it has none
+
+        A bad value only skips this entity, the other ones of the cycle are still sent.
+        """
+        # Handle different sensor formats
+        if data['state'] == 'unavailable' or data['state'] == 'unknown':
+            logger.warning(f"Sensor {entity_id} is {data['state']}")
+            return None
+
+        try:
+            # Try to get temperature directly from state
+            return float(data['state'])
+        except (TypeError, ValueError):
+            pass
+
+        # If state isn't a number, try to get it from attributes
+        attributes = data.get('attributes') or {}
+        if 'temperature' not in attributes:
+            logger.error(f"Could not extract temperature from {entity_id}")
+            return None
+
+        temperature = attributes['temperature']
+        if temperature is None:
+            # E.g. a climate entity that is off
+            logger.debug(f"{entity_id} has no temperature while it is {data['state']}")
+            return None
+        try:
+            return float(temperature)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring temperature {temperature!r} of {entity_id}, it is not a number")
+            return None
+
+    def dispatch(self, temperatures):
+        """Hand the temperatures of each controller to its worker without waiting for the send"""
+        for name, controller_temperatures in temperatures.items():
+            self.workers[name].submit(controller_temperatures)
+
+    def resend_temperatures(self):
+        """Hand the latest temperatures to the workers again
+
+        A stable sensor sends no state changes via WebSocket, so without this
+        its area would never get the heartbeat of max_update_age. The workers
+        skip every temperature that is neither outside the deadband nor due.
+        """
+        with span('dispatch'):
+            self.dispatch(self.temperatures)
+
+    def dispatch_targets(self, targets):
+        """Hand the target temperatures of each controller to its worker"""
+        for name, controller_targets in targets.items():
+            self.workers[name].submit_targets(controller_targets)
+
+    def dispatch_states(self, states):
+        """Hand the readings and targets of the fetched states to the workers"""
+        if states is None:
+            return
+
+        with span('read_temperatures'):
+            temperatures = self.read_temperatures(states)
+            targets = self.read_targets(states)
+
+        with span('dispatch'):
+            self.dispatch(temperatures)
+            self.dispatch_targets(targets)
+
+    def start_websocket(self):
+        """Subscribe to sensor state changes via the Home Assistant WebSocket API"""
+        from ha_websocket import HAWebSocketListener
+
+        self.ws_listener = HAWebSocketListener(
+            self.ha_ws_url,
+            self.ha_token,
+            self.entity_ids,
+            # Every (re)connect starts with the current states, which also
+            # catches up on the changes missed while the socket was down
+            on_state=self.on_state_changed,
+            # A reconnect may as well be a restart of Home Assistant
+            on_connected=self.republish,
+        )
+        self.ws_listener.start()
+
+    def republish(self):
+        """Publish the mirrored entities again, Home Assistant loses them when it restarts"""
+        for mirror in self.mirrors:
+            mirror.republish()
+
+    def on_state_changed(self, entity_id, new_state):
+        """Forward a state change received via WebSocket to Alpha 2"""
+        if entity_id in self.targets_by_entity:
+            self.dispatch_targets(self.read_targets({entity_id: new_state}))
+        if entity_id not in self.devices_by_entity:
+            return
+
+        self.update_reading(entity_id, new_state)
+
+        # The other sensors of these areas keep their latest readings. An area
+        # without any is dropped from the temperatures resent by a cycle.
+        self.dispatch(self.aggregate_temperatures(dict.fromkeys(
+            (device['controller'], device['area_id']) for device in self.devices_by_entity[entity_id]
+        )))
+
 if __name__ == "__main__":
     integration = Alpha2Integration()
     integration.start()
\ No newline at end of file
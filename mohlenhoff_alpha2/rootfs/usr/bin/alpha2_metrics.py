@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Port the /metrics endpoint listens on inside the container
+METRICS_PORT = 9464
+
+# Histogram buckets in seconds, from a fast LAN round-trip up to a timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {value}"]
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, count, total = self._values.get(key, ([0] * len(self.buckets), 0, 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, count + 1, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, including failed attempts"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def _render_value(self, labels, value):
+        counts, count, total = value
+        lines = [
+            f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {bucket_count}"
+            for bound, bucket_count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HA_FETCH_SECONDS = REGISTRY.register(Histogram(
+    'alpha2_ha_fetch_seconds', 'Duration of Home Assistant state fetches'))
+CHANGES_POST_SECONDS = REGISTRY.register(Histogram(
+    'alpha2_changes_post_seconds', 'Duration of changes.xml posts to Alpha 2'))
+AREA_UPDATES = REGISTRY.register(Counter(
+    'alpha2_area_updates_total', 'Temperature updates per controller and heating area by result (sent, skipped, error)'))
+AREA_LAST_UPDATE = REGISTRY.register(Gauge(
+    'alpha2_area_last_update_timestamp_seconds', 'Unix time of the last successful update per controller and heating area'))
+CYCLE_SECONDS = REGISTRY.register(Histogram(
+    'alpha2_cycle_duration_seconds', 'Duration of a monitor loop cycle, without the sends of the controller workers'))
+SEND_SECONDS = REGISTRY.register(Histogram(
+    'alpha2_send_duration_seconds', 'Duration of sending the changes of a cycle per controller'))
+CYCLE_OVERRUNS = REGISTRY.register(Counter(
+    'alpha2_cycle_overruns_total', 'Monitor loop cycles that took longer than update_interval'))
+MIRROR_WRITES = REGISTRY.register(Counter(
+    'alpha2_mirror_writes_total', 'Heating area entities written to Home Assistant by the mirror by result (sent, error)'))
+TARGET_UPDATES = REGISTRY.register(Counter(
+    'alpha2_target_updates_total', 'Target temperatures set from Home Assistant by result (sent, skipped, error)'))
+CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    'alpha2_circuit_open', 'Whether the circuit breaker of an endpoint is open (1) or closed (0)'))
+CIRCUIT_REJECTED = REGISTRY.register(Counter(
+    'alpha2_circuit_rejected_total', 'Requests not sent because the circuit breaker of the endpoint was open'))
+
+
+def start_metrics_server(port=METRICS_PORT, host='0.0.0.0', registry=REGISTRY):
+    """Serve /metrics from a background thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes would otherwise flood the add-on log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logging.getLogger(__name__).info(f"Serving metrics on port {port}")
+    return server
@@ -0,0 +1,159 @@
+import re
+import logging
+from alpha2_metrics import MIRROR_WRITES
+from alpha2_trace import span
+
+logger = logging.getLogger('alpha2-integration')
+
+# Mirrored value of a heating area: (entity suffix, name, unit, device class)
+MIRROR_FIELDS = (
+    ('temperature', 'temperature', '°C', 'temperature'),
+    ('target_temperature', 'target temperature', '°C', 'temperature'),
+    ('state', 'state', None, None),
+    ('actuator', 'actuator', '%', None),
+)
+
+
+def area_values(model, area_nr):
+    """Extract the mirrored values of a HEATAREA from an Alpha2Model"""
+    heat_area = model.heat_areas[area_nr]
+    return {
+        'temperature': heat_area.t_actual,
+        'target_temperature': heat_area.t_target,
+        'state': heat_area.state,
+        # An area can have several actuators, report the one opened furthest
+        'actuator': model.actuator_percent(area_nr),
+    }
+
+
+class Alpha2Mirror:
+    """Publishes the heating areas of a base station as Home Assistant entities
+
+    Every mirrored value of an area is its own entity, e.g.
+    sensor.alpha2_default_area_1_target_temperature, and only values that
+    changed since they were last published are written to Home Assistant.
+    The areas to check are taken from the changes of the client's model.
+
+    Home Assistant doesn't keep entities written via the REST API across a
+    restart, so after republish() every value is published again.
+    """
+
+    def __init__(self, controller, session, ha_url, ha_headers, timeout, breaker):
+        self.controller = controller
+        self.breaker = breaker
+        self.session = session
+        self.ha_url = ha_url
+        self.ha_headers = ha_headers
+        self.timeout = timeout
+        self.slug = re.sub(r'[^a-z0-9]+', '_', controller.lower()).strip('_')
+
+        # Last value published per entity ID and the areas changed since the last sync
+        self.published = {}
+        self.model = None
+        self.changed_areas = set()
+        self._republish = False
+
+    def entity_id(self, area_nr, field):
+        return f"sensor.alpha2_{self.slug}_area_{area_nr}_{field}"
+
+    def attach(self, model):
+        """Follow the changes of the model of a client"""
+        self.model = model
+        model.subscribe(self.on_changes)
+        # The client may have loaded the model already, its changes are gone
+        self.republish()
+
+    def on_changes(self, changes):
+        for change in changes:
+            if change.kind == 'heat_area':
+                self.changed_areas.add(change.nr)
+            elif change.kind == 'heat_ctrl' and change.attribute is None:
+                # A removed actuator is passed as the old value
+                self.changed_areas.add(change.old.heatarea_nr)
+            elif change.kind == 'heat_ctrl':
+                # A reassigned actuator changes its old and its new area
+                heat_ctrl = self.model.heat_ctrls.get(change.nr)
+                self.changed_areas.add(heat_ctrl.heatarea_nr if heat_ctrl else None)
+                if change.attribute == 'heatarea_nr':
+                    self.changed_areas.add(change.old)
+
+    def republish(self):
+        """Publish every value again with the next sync, e.g. once Home Assistant is back"""
+        self._republish = True
+
+    def target_temperature(self, area_nr):
+        """Last target temperature of an area read from the base station"""
+        if self.model is None or area_nr not in self.model.heat_areas:
+            return None
+        return self.model.heat_areas[area_nr].t_target
+
+    def sync(self, client):
+        """Read cyclic.xml once and publish the values that changed"""
+        with span('update_model'):
+            changes = client.update_model()
+        if changes is None:
+            return
+
+        if self._republish:
+            self._republish = False
+            self.published = {}
+            self.changed_areas.update(self.model.heat_areas)
+
+        changed_areas, self.changed_areas = self.changed_areas, set()
+        for area_nr in changed_areas:
+            if area_nr not in self.model.heat_areas:
+                continue
+
+            values = area_values(self.model, area_nr)
+            for field, name, unit, device_class in MIRROR_FIELDS:
+                value = values[field]
+                entity_id = self.entity_id(area_nr, field)
+                if value is None or self.published.get(entity_id) == value:
+                    continue
+
+                attributes = {'friendly_name': f"Alpha 2 {self.controller} area {area_nr} {name}"}
+                if unit:
+                    attributes['unit_of_measurement'] = unit
+                if device_class:
+                    attributes['device_class'] = device_class
+
+                if self.publish(entity_id, value, attributes):
+                    self.published[entity_id] = value
+                else:
+                    # Try again with the next sync
+                    self.changed_areas.add(area_nr)
+
+    def publish(self, entity_id, value, attributes):
+        """Write the state of an entity to Home Assistant"""
+        if not self.breaker.allow():
+            logger.debug(f"Circuit to Home Assistant is open, not publishing {entity_id}")
+            MIRROR_WRITES.inc(controller=self.controller, result='error')
+            return False
+
+        logger.debug(f"Publishing {value} to {entity_id}")
+        try:
+            with span('ha_publish', entity_id=entity_id):
+                response = self.session.post(
+                    f"{self.ha_url}/api/states/{entity_id}",
+                    headers=self.ha_headers,
+                    json={'state': value, 'attributes': attributes},
+                    timeout=self.timeout
+                )
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"Error publishing {entity_id} to Home Assistant: {e}")
+            MIRROR_WRITES.inc(controller=self.controller, result='error')
+            return False
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if response.status_code not in (200, 201):
+            logger.error(f"Failed to publish {entity_id} to Home Assistant: {response.status_code}")
+            MIRROR_WRITES.inc(controller=self.controller, result='error')
+            return False
+
+        MIRROR_WRITES.inc(controller=self.controller, result='sent')
+        return True
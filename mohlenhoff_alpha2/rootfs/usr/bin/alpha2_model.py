@@ -0,0 +1,212 @@
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger('alpha2-integration')
+
+# A changed attribute of an element. An element that appeared has one change
+# per attribute with old None, one that disappeared a change with attribute None.
+Change = namedtuple('Change', ('kind', 'nr', 'attribute', 'old', 'new'))
+
+
+def _flag(text):
+    return text == '1'
+
+
+def _slots(fields):
+    return tuple(attribute for attribute, _ in fields.values())
+
+
+class Element:
+    """An element of the base station, FIELDS maps XML tags to (attribute, converter)"""
+
+    __slots__ = ('nr',)
+    KIND = None
+    FIELDS = {}
+
+    def __init__(self, nr):
+        self.nr = nr
+        for attribute, _ in self.FIELDS.values():
+            setattr(self, attribute, None)
+
+    def set(self, tag, text, changes):
+        """Set the field of an XML tag, recording a Change if its value differs"""
+        field = self.FIELDS.get(tag)
+        if field is None:
+            return
+
+        attribute, convert = field
+        try:
+            value = None if text is None else convert(text)
+        except ValueError:
+            value = None
+
+        old = getattr(self, attribute)
+        if value != old:
+            setattr(self, attribute, value)
+            changes.append(Change(self.KIND, self.nr, attribute, old, value))
+
+    def update(self, elem, changes):
+        for child in elem:
+            self.set(child.tag, child.text, changes)
+
+    def __repr__(self):
+        values = ', '.join(f"{attribute}={getattr(self, attribute)!r}" for attribute, _ in self.FIELDS.values())
+        return f"{type(self).__name__}(nr={self.nr!r}, {values})"
+
+
+class Device(Element):
+    KIND = 'device'
+    FIELDS = {
+        'ID': ('id', str),
+        'NAME': ('name', str),
+        'TYPE': ('type', str),
+        'DATETIME': ('datetime', str),
+        'ERRORCOUNT': ('error_count', int),
+        'VERS_SW_STM': ('sw_version_stm', str),
+        'VERS_SW_ETH': ('sw_version_eth', str),
+        'MODE': ('mode', int),
+        'COOLING': ('cooling', _flag),
+        'ANTIFREEZE': ('antifreeze', _flag),
+        'ANTIFREEZE_TEMP': ('antifreeze_temperature', float),
+        'T_HEAT_VACATION': ('t_heat_vacation', float),
+    }
+    __slots__ = _slots(FIELDS)
+
+
+class HeatArea(Element):
+    KIND = 'heat_area'
+    FIELDS = {
+        'HEATAREA_NAME': ('name', str),
+        'HEATAREA_MODE': ('mode', int),
+        'HEATAREA_STATE': ('state', int),
+        'T_ACTUAL': ('t_actual', float),
+        'T_ACTUAL_EXT': ('t_actual_ext', float),
+        'T_TARGET': ('t_target', float),
+        'T_TARGET_BASE': ('t_target_base', float),
+        'T_TARGET_MIN': ('t_target_min', float),
+        'T_TARGET_MAX': ('t_target_max', float),
+        'T_HEAT_DAY': ('t_heat_day', float),
+        'T_HEAT_NIGHT': ('t_heat_night', float),
+        'OFFSET': ('offset', float),
+        'PARTY': ('party', _flag),
+        'PRESENCE': ('presence', _flag),
+        'ISLOCKED': ('locked', _flag),
+    }
+    __slots__ = _slots(FIELDS)
+
+
+class HeatCtrl(Element):
+    KIND = 'heat_ctrl'
+    FIELDS = {
+        'INUSE': ('in_use', _flag),
+        'HEATAREA_NR': ('heatarea_nr', int),
+        'ACTOR': ('actor', int),
+        'ACTOR_PERCENT': ('actor_percent', int),
+        'HEATCTRL_STATE': ('state', int),
+    }
+    __slots__ = _slots(FIELDS)
+
+
+class IODevice(Element):
+    KIND = 'iodevice'
+    FIELDS = {
+        'IODEVICE_TYPE': ('type', int),
+        'IODEVICE_ID': ('id', int),
+        'IODEVICE_VERS_SW': ('sw_version', str),
+        'HEATAREA_NR': ('heatarea_nr', int),
+        'IODEVICE_STATE': ('state', int),
+        'IODEVICE_COMERROR': ('comerror', int),
+        'SIGNALSTRENGTH': ('signal_strength', int),
+        'BATTERY': ('battery', int),
+        'ISON': ('is_on', _flag),
+    }
+    __slots__ = _slots(FIELDS)
+
+
+# Numbered elements of Devices/Device and the attribute of Alpha2Model holding them
+ELEMENTS = {'HEATAREA': (HeatArea, 'heat_areas'), 'HEATCTRL': (HeatCtrl, 'heat_ctrls'), 'IODEVICE': (IODevice, 'iodevices')}
+
+
+class Alpha2Model:
+    """Typed state of one base station, kept between reads and updated in place
+
+    The model is loaded once from a complete static.xml and then updated
+    from dynamic.xml or cyclic.xml, which only carry some of the fields.
+    Listeners registered with subscribe() receive the list of Changes of
+    every applied document, so consumers only react to values that changed.
+    """
+
+    def __init__(self):
+        self.device = Device(None)
+        self.heat_areas = {}
+        self.heat_ctrls = {}
+        self.iodevices = {}
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """Call listener(changes) after every document that changed the model"""
+        self._listeners.append(listener)
+
+    def actuator_percent(self, area_nr):
+        """Opening of the actuator of an area opened furthest, None if it has none"""
+        percents = [
+            heat_ctrl.actor_percent for heat_ctrl in self.heat_ctrls.values()
+            if heat_ctrl.heatarea_nr == area_nr and heat_ctrl.in_use is not False
+            and heat_ctrl.actor_percent is not None
+        ]
+        return max(percents, default=None)
+
+    def iodevices_by_type(self):
+        """IODEVICEs grouped by their IODEVICE_TYPE"""
+        devices_by_type = {}
+        with self._lock:
+            for iodevice in self.iodevices.values():
+                devices_by_type.setdefault(iodevice.type, []).append(iodevice)
+        return devices_by_type
+
+    def apply(self, elements, complete=False):
+        """Apply the children of Devices/Device, see iter_device_children()
+
+        With complete the document is a full snapshot like static.xml, and
+        elements missing from it are removed. Returns the list of Changes.
+        """
+        changes = []
+        seen = {collection: set() for _, collection in ELEMENTS.values()}
+
+        try:
+            with self._lock:
+                for elem in elements:
+                    if elem.tag in ELEMENTS:
+                        element_class, collection = ELEMENTS[elem.tag]
+                        elements_by_nr = getattr(self, collection)
+                        nr = int(elem.get('nr'))
+                        seen[collection].add(nr)
+                        if nr not in elements_by_nr:
+                            elements_by_nr[nr] = element_class(nr)
+                        elements_by_nr[nr].update(elem, changes)
+                    elif not len(elem):
+                        self.device.set(elem.tag, elem.text, changes)
+
+                if complete:
+                    for collection, nrs in seen.items():
+                        elements_by_nr = getattr(self, collection)
+                        for nr in set(elements_by_nr) - nrs:
+                            removed = elements_by_nr.pop(nr)
+                            changes.append(Change(removed.KIND, nr, None, removed, None))
+                    self.loaded = True
+        finally:
+            # A document that broke off still changed the model up to that point
+            if changes:
+                self._notify(changes)
+
+        return changes
+
+    def _notify(self, changes):
+        for listener in self._listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                logger.error(f"Error handling changes of the base station: {e}")
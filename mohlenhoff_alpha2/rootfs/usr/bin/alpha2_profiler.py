@@ -0,0 +1,115 @@
+import os
+import sys
+import glob
+import time
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger('alpha2-integration')
+
+# Profiles are written next to the cached state, which survives restarts
+PROFILE_DIR = '/data'
+
+# Seconds a profile runs and seconds between two samples
+PROFILE_SECONDS = 30
+SAMPLE_INTERVAL = 0.01
+
+# Slow cycles tend to last for hours, so they start at most one profile per
+# cooldown, and only the newest profiles are kept to bound the space on /data
+PROFILE_COOLDOWN = 3600
+PROFILE_KEEP = 5
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads of the running process
+
+    Every interval the current frame of each thread is read with
+    sys._current_frames(), so the profiled code is neither restarted nor
+    instrumented. The samples are written in the collapsed stack format
+    ("thread;outer;...;inner count" per line) read by flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, seconds=PROFILE_SECONDS, interval=SAMPLE_INTERVAL,
+                 cooldown=PROFILE_COOLDOWN, keep=PROFILE_KEEP):
+        self.directory = directory
+        self.seconds = seconds
+        self.interval = interval
+        self.cooldown = cooldown
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._running = False
+        self._last_start = None
+
+    def start(self, automatic=False):
+        """Start a profile in the background, returns False if one is running
+
+        An automatic profile, started by a slow cycle, is also skipped until
+        the cooldown since the previous profile passed.
+        """
+        with self._lock:
+            if self._running:
+                return False
+            now = time.monotonic()
+            if automatic and self._last_start is not None and now - self._last_start < self.cooldown:
+                return False
+            self._running = True
+            self._last_start = now
+
+        threading.Thread(target=self._run, name='profiler', daemon=True).start()
+        return True
+
+    def _run(self):
+        try:
+            logger.info(f"Profiling for {self.seconds} seconds")
+            stacks, samples = self.sample()
+            self.write(stacks, samples)
+        except Exception as e:
+            logger.error(f"Error profiling: {e}")
+        finally:
+            with self._lock:
+                self._running = False
+
+    def sample(self):
+        """Count the stacks seen in every thread until the profile duration passed"""
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+
+                functions = []
+                while frame is not None:
+                    code = frame.f_code
+                    functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                functions.append(names.get(ident, str(ident)))
+                stacks[';'.join(reversed(functions))] += 1
+
+            samples += 1
+            time.sleep(self.interval)
+
+        return stacks, samples
+
+    def write(self, stacks, samples):
+        path = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Wrote profile of {samples} samples to {path}")
+        self.remove_old()
+
+    def remove_old(self):
+        """Delete all but the newest keep profiles"""
+        # The timestamp in the name sorts like the time of the profile
+        for path in sorted(glob.glob(os.path.join(self.directory, 'profile-*.txt')))[:-self.keep]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old profile {path}: {e}")
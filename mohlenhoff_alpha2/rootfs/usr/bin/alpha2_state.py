@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger('alpha2-integration')
+
+# Survives add-on restarts and updates, like options.json
+STATE_PATH = '/data/state.json'
+
+# Seconds between writes of a changed state, limits the wear of SD cards
+FLUSH_INTERVAL = 60
+
+
+class StateStore:
+    """Keeps the cached state of every controller in a JSON file
+
+    Changes are only marked dirty and written by a background thread every
+    flush_interval, or right away by flush(). The file is replaced
+    atomically, so an interrupted write leaves the previous state behind.
+    """
+
+    def __init__(self, path=STATE_PATH, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            logger.info(f"Loaded cached state from {self.path}")
+            return data
+        except FileNotFoundError:
+            return {'controllers': {}}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached state {self.path}: {e}")
+            return {'controllers': {}}
+
+    def get(self, controller):
+        """Cached state of a controller, or None"""
+        with self._lock:
+            return self._data['controllers'].get(controller)
+
+    def update(self, controller, state):
+        """Replace the cached state of a controller, written with the next flush"""
+        with self._lock:
+            self._data['controllers'][controller] = state
+            self._dirty = True
+
+    def flush(self):
+        """Write the state if it changed since the last write"""
+        with self._lock:
+            if not self._dirty:
+                return
+            content = json.dumps(self._data)
+            self._dirty = False
+
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Error writing cached state to {self.path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def start(self):
+        """Flush changes from a background thread"""
+        threading.Thread(target=self._flush_loop, name='state', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
@@ -0,0 +1,70 @@
+import json
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger('alpha2-integration')
+
+# Cycles and sends taking longer than this many seconds are logged with their spans
+TRACE_THRESHOLD = 5.0
+
+# A context variable follows both worker threads and asyncio tasks
+_current = ContextVar('alpha2_trace', default=None)
+
+
+class Trace:
+    """Stages of one cycle (or send) and how long each of them took"""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+
+    def to_json(self):
+        return json.dumps({
+            'trace': self.name,
+            **self.attributes,
+            'duration_ms': round(self.duration * 1000, 3),
+            'spans': [
+                {'name': name, **attributes, 'start_ms': round(start * 1000, 3), 'duration_ms': round(duration * 1000, 3)}
+                # Spans are recorded when they end, list them in the order they started
+                for name, attributes, start, duration in sorted(self.spans, key=lambda span: span[2])
+            ],
+        })
+
+
+@contextmanager
+def trace(name, threshold=TRACE_THRESHOLD, **attributes):
+    """Collect the spans of a cycle and log them as a JSON line if it took longer than threshold
+
+    A threshold of 0 never logs. The Trace is returned, so its duration can
+    be read once the block finished.
+    """
+    current = Trace(name, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.duration = time.perf_counter() - current.started
+        if threshold and current.duration > threshold:
+            logger.warning(f"Slow {name}: {current.to_json()}")
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record the duration of a stage of the current trace, does nothing outside of one"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        finished = time.perf_counter()
+        current.spans.append((name, attributes, started - current.started, finished - started))
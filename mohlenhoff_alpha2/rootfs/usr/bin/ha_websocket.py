@@ -0,0 +1,161 @@
+import json
+import logging
+import random
+import threading
+
+import websocket
+
+
+def _expand_state(entity_id, compressed):
+    """Convert a compressed state of subscribe_entities to a state object like /api/states returns"""
+    return {'entity_id': entity_id, 'state': compressed.get('s'), 'attributes': dict(compressed.get('a', {}))}
+
+
+class HAWebSocketListener(threading.Thread):
+    """Subscribe to the state changes of the configured entities and forward them
+
+    Home Assistant filters the events by entity ID with subscribe_entities,
+    so the add-on doesn't receive every state_changed event of the
+    installation. The subscription starts with the current state of every
+    entity and then sends only the changed parts of a state, which are
+    merged into the last known one before it is forwarded.
+    """
+
+    def __init__(self, url, token, entity_ids, on_state, on_connected=None,
+                 timeout=10, heartbeat=30, max_backoff=300):
+        super().__init__(name='ha-websocket', daemon=True)
+        self.url = url
+        self.token = token
+        self.entity_ids = set(entity_ids)
+        self.on_state = on_state
+        self.on_connected = on_connected
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.max_backoff = max_backoff
+        self.logger = logging.getLogger(__name__)
+        self._connected = threading.Event()
+        self._stopped = threading.Event()
+        self._ws = None
+        self._msg_id = 0
+        self._subscription = None
+
+        # Last known state object per entity ID, updated from the diffs
+        self._states = {}
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def stop(self):
+        self._stopped.set()
+        if self._ws:
+            self._ws.close()
+
+    def run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                self._connect()
+                backoff = 1
+                self._listen()
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                self.logger.warning(f"WebSocket connection to Home Assistant failed: {e}")
+            finally:
+                self._connected.clear()
+                if self._ws:
+                    self._ws.close()
+                    self._ws = None
+
+            # Reconnect with exponential backoff and jitter
+            delay = min(backoff, self.max_backoff) * random.uniform(0.5, 1.0)
+            self.logger.info(f"Reconnecting to Home Assistant WebSocket in {delay:.1f} seconds")
+            self._stopped.wait(delay)
+            backoff *= 2
+
+    def _send(self, message):
+        self._msg_id += 1
+        message['id'] = self._msg_id
+        self._ws.send(json.dumps(message))
+        return self._msg_id
+
+    def _receive(self):
+        return json.loads(self._ws.recv())
+
+    def _connect(self):
+        self._msg_id = 0
+        self._ws = websocket.create_connection(self.url, timeout=self.timeout)
+
+        message = self._receive()
+        if message.get('type') != 'auth_required':
+            raise ConnectionError(f"Unexpected message during handshake: {message}")
+
+        self._ws.send(json.dumps({'type': 'auth', 'access_token': self.token}))
+        message = self._receive()
+        if message.get('type') != 'auth_ok':
+            raise ConnectionError(f"Authentication failed: {message.get('message', message.get('type'))}")
+
+        self._subscription = self._send({'type': 'subscribe_entities', 'entity_ids': sorted(self.entity_ids)})
+        message = self._receive()
+        if message.get('id') != self._subscription or not message.get('success'):
+            raise ConnectionError(f"Failed to subscribe to entities: {message}")
+        self._states = {}
+
+        self.logger.info(f"Subscribed to state changes of {len(self.entity_ids)} entities")
+        self._connected.set()
+
+        if self.on_connected:
+            self.on_connected()
+
+    def _listen(self):
+        self._ws.settimeout(self.heartbeat)
+        awaiting_pong = False
+
+        while not self._stopped.is_set():
+            try:
+                message = self._receive()
+            except websocket.WebSocketTimeoutException:
+                # No traffic for a while, make sure the connection is still alive
+                if awaiting_pong:
+                    raise ConnectionError("No answer to ping")
+                self._send({'type': 'ping'})
+                awaiting_pong = True
+                continue
+
+            awaiting_pong = False
+            if message.get('type') == 'event' and message.get('id') == self._subscription:
+                self._handle_event(message['event'])
+
+    def _handle_event(self, event):
+        # Complete states: the current ones after subscribing, or entities that were added
+        for entity_id, compressed in event.get('a', {}).items():
+            self._states[entity_id] = _expand_state(entity_id, compressed)
+            self._forward(entity_id)
+
+        for entity_id, diff in event.get('c', {}).items():
+            state = self._states.get(entity_id)
+            if state is None:
+                continue
+
+            added = diff.get('+', {})
+            if 's' in added:
+                state['state'] = added['s']
+            state['attributes'].update(added.get('a', {}))
+            for attribute in diff.get('-', {}).get('a', []):
+                state['attributes'].pop(attribute, None)
+            self._forward(entity_id)
+
+        # Removed entities have no state to forward, like the state_changed event without new_state
+        for entity_id in event.get('r', []):
+            self._states.pop(entity_id, None)
+
+    def _forward(self, entity_id):
+        if entity_id in self.entity_ids:
+            # A copy, so the receiver can keep it while the next diff is merged
+            state = self._states[entity_id]
+            try:
+                self.on_state(entity_id, dict(state, attributes=dict(state['attributes'])))
+            except Exception as e:
+                # The connection is fine, reconnecting would only deliver the same state again
+                self.logger.error(f"Error handling the state of {entity_id}: {e}")